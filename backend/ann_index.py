@@ -0,0 +1,123 @@
+import math
+
+import torch
+
+###############################################################################
+# IVF Index for Maximum Inner Product Search
+###############################################################################
+# Movies are clustered with k-means into `nlist` inverted lists. A query is
+# compared against the centroids, the `nprobe` best lists are opened and their
+# members become the candidate set for exact re-scoring. Raising `nprobe`
+# trades latency for recall; nprobe == nlist is exact search.
+
+
+class IVFIndex:
+    def __init__(self, vectors, nlist=None, nprobe=8, iters=15, seed=0,
+                 max_train_per_list=64):
+        """
+        Build the index over `vectors` [N, D]; returned candidates are row
+        numbers into `vectors`. `nlist` defaults to ~2 * sqrt(N), and k-means
+        is trained on at most `max_train_per_list` sampled points per list.
+        """
+        vectors = vectors.detach().float()
+        num_vectors = vectors.shape[0]
+        self.nlist = max(1, min(nlist or int(2 * math.sqrt(num_vectors)), num_vectors))
+        self.nprobe = nprobe
+
+        generator = torch.Generator().manual_seed(seed)
+        sample = torch.randperm(num_vectors, generator=generator)[:self.nlist * max_train_per_list]
+        self.centroids = self._kmeans(vectors[sample.to(vectors.device)], self.nlist, iters, generator)
+        assign = self._assign(vectors, self.centroids)
+
+        # Members of every list stored contiguously: order[offsets[l]:offsets[l+1]]
+        self.order = torch.argsort(assign, stable=True)
+        counts = torch.bincount(assign, minlength=self.nlist)
+        self.offsets = torch.zeros(self.nlist + 1, dtype=torch.long, device=vectors.device)
+        self.offsets[1:] = torch.cumsum(counts, dim=0)
+
+    @staticmethod
+    def _assign(vectors, centroids):
+        # argmin ||v - c||^2 == argmin (||c||^2 - 2 v.c)
+        dist = (centroids * centroids).sum(dim=1) - 2 * vectors @ centroids.T
+        return dist.argmin(dim=1)
+
+    @classmethod
+    def _kmeans(cls, vectors, k, iters, generator):
+        init = torch.randperm(vectors.shape[0], generator=generator)[:k]
+        centroids = vectors[init.to(vectors.device)].clone()
+
+        for _ in range(iters):
+            assign = cls._assign(vectors, centroids)
+            sums = torch.zeros_like(centroids).index_add_(0, assign, vectors)
+            counts = torch.bincount(assign, minlength=k).unsqueeze(1)
+            # Empty clusters keep their previous centroid
+            centroids = torch.where(counts > 0, sums / counts.clamp(min=1), centroids)
+        return centroids
+
+    def search(self, queries, nprobe=None):
+        """
+        Candidate rows for each query [B, D] by inner product.
+        Returns a LongTensor [B, L] padded with -1 where a query's probed
+        lists hold fewer than L members.
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes = torch.topk(queries @ self.centroids.T, nprobe, dim=1).indices
+
+        starts = self.offsets[probes]
+        lengths = self.offsets[probes + 1] - starts
+        totals = lengths.sum(dim=1)
+        width = int(totals.max()) if totals.numel() else 0
+
+        # Position j of query b falls into probed list p where the running
+        # sum of lengths passes j; gather those members without a Python loop.
+        ends = torch.cumsum(lengths, dim=1)
+        positions = torch.arange(width, device=queries.device).repeat(len(queries), 1)
+        probe_slot = torch.searchsorted(ends, positions, right=True).clamp(max=nprobe - 1)
+        within = positions - (ends.gather(1, probe_slot) - lengths.gather(1, probe_slot))
+        members = starts.gather(1, probe_slot) + within
+
+        valid = positions < totals.unsqueeze(1)
+        candidates = self.order[members.clamp(max=len(self.order) - 1)]
+        return torch.where(valid, candidates, torch.full_like(candidates, -1))
+
+
+###############################################################################
+# Scoring-head Monotonicity
+###############################################################################
+
+
+def mlp_direction(edge_mlp):
+    """
+    `predict_prob` is sigmoid(edge_mlp(dot)), with edge_mlp a
+    Linear(1, H) -> ReLU -> Linear(H, 1) on the scalar dot product. That is a
+    piecewise-linear function of the dot, so its monotonicity can be read off
+    exactly from the slope of every segment between ReLU breakpoints.
+
+    Returns +1 if the score never decreases with the dot product, -1 if it
+    never increases, and 0 if it is not monotonic (ranking by inner product
+    is then not equivalent to ranking by probability).
+    """
+    # children() rather than indexing, which TorchScript modules do not support
+    lin1, _, lin2 = edge_mlp.children()
+    w1 = lin1.weight.detach().view(-1)
+    b1 = lin1.bias.detach().view(-1)
+    w2 = lin2.weight.detach().view(-1)
+
+    # Evaluate the slope at one point inside every segment, plus both tails
+    active_w = w1[w1 != 0]
+    breaks = torch.sort(-b1[w1 != 0] / active_w).values
+    if len(breaks):
+        span = float(breaks[-1] - breaks[0]) + 1.0
+        inner = (breaks[:-1] + breaks[1:]) / 2
+        points = torch.cat([breaks[:1] - span, inner, breaks[-1:] + span])
+    else:
+        points = torch.zeros(1)
+
+    active = (points.unsqueeze(1) * w1 + b1) > 0
+    slopes = (active.float() * (w1 * w2)).sum(dim=1)
+
+    if bool((slopes >= 0).all()):
+        return 1
+    if bool((slopes <= 0).all()):
+        return -1
+    return 0
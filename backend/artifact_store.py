@@ -0,0 +1,79 @@
+import json
+import struct
+
+import numpy as np
+
+###############################################################################
+# Flat Binary Array Store
+###############################################################################
+# Layout: MAGIC | uint64 header length | JSON header | padding | raw arrays
+#
+# The JSON header records free-form metadata plus dtype/shape/offset for every
+# array. Each array starts on an ALIGNMENT boundary so it can be viewed
+# straight out of a memory map without copying.
+
+MAGIC = b"GNNREC01"
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_arrays(path, arrays, meta=None):
+    """
+    Write a dict of NumPy arrays (plus JSON-serialisable `meta`) to `path`.
+    """
+    arrays = {name: np.ascontiguousarray(arr) for name, arr in arrays.items()}
+
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        offset = _align(offset)
+        layout[name] = {
+            "dtype": arr.dtype.str,
+            "shape": list(arr.shape),
+            "offset": offset,
+        }
+        offset += arr.nbytes
+
+    header = json.dumps({"meta": meta or {}, "arrays": layout}).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            # Write straight from the array's buffer; tobytes() would copy it
+            f.write(np.ascontiguousarray(arr).data)
+        f.truncate(data_start + offset)
+
+
+def read_arrays(path):
+    """
+    Memory-map a file written by `write_arrays`.
+
+    Returns (arrays, meta). The arrays are copy-on-write views of one shared
+    mapping: nothing is read until touched, and every process that opens the
+    same file shares the same page-cache pages.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an array store (bad magic {magic!r})")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+
+    data_start = _align(len(MAGIC) + 8 + header_len)
+    mm = np.memmap(path, dtype=np.uint8, mode="c")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        start = data_start + spec["offset"]
+        arrays[name] = np.asarray(mm[start:start + nbytes]).view(dtype).reshape(shape)
+    return arrays, header["meta"]
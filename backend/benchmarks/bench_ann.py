@@ -0,0 +1,98 @@
+import os
+import time
+import argparse
+
+import torch
+
+from ann_index import IVFIndex
+from benchmarks.common import latency_summary, print_table
+
+###############################################################################
+# IVF Recall / Latency vs Exact Inner-product Search
+###############################################################################
+# Ranking by predict_prob is ranking by the dot product whenever edge_mlp is
+# monotonic, so recall is measured on inner products directly.
+
+
+def clustered_embeddings(num_movies, dim, num_clusters=200, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    centers = torch.randn(num_clusters, dim, generator=generator)
+    assign = torch.randint(num_clusters, (num_movies,), generator=generator)
+    return centers[assign] + 0.3 * torch.randn(num_movies, dim, generator=generator)
+
+
+def exact_topk(movie_emb, queries, k):
+    return torch.topk(queries @ movie_emb.T, k, dim=1).indices
+
+
+def ivf_topk(index, movie_emb, queries, k, nprobe):
+    candidates = index.search(queries, nprobe)
+    safe = candidates.clamp(min=0)
+    scores = (queries.unsqueeze(1) * movie_emb[safe]).sum(dim=-1)
+    scores = scores.masked_fill(candidates < 0, float("-inf"))
+    slots = torch.topk(scores, min(k, scores.shape[1]), dim=1).indices
+    return safe.gather(1, slots)
+
+
+def recall(approx, exact):
+    hits = sum(
+        len(set(a.tolist()) & set(e.tolist())) for a, e in zip(approx, exact)
+    )
+    return hits / exact.numel()
+
+
+def time_per_query(fn, queries, batch_size):
+    timings = []
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        t0 = time.perf_counter()
+        fn(batch)
+        timings.append((time.perf_counter() - t0) / len(batch))
+    return latency_summary(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall/latency of the IVF movie index")
+    parser.add_argument("--artifact", default="./model/embeddings.bin",
+                        help="use real movie embeddings when this file exists")
+    parser.add_argument("--movies", type=int, default=60_000)
+    parser.add_argument("--dim", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    args = parser.parse_args()
+
+    if os.path.exists(args.artifact):
+        from recommender_model import load_embeddings
+        arrays, _ = load_embeddings(args.artifact)
+        movie_emb = torch.from_numpy(arrays["movie_emb"]).float()
+        source = args.artifact
+    else:
+        movie_emb = clustered_embeddings(args.movies, args.dim)
+        source = "synthetic"
+
+    # Queries shaped like cold-start users: means of a few random movies
+    generator = torch.Generator().manual_seed(1)
+    picks = torch.randint(len(movie_emb), (args.queries, 5), generator=generator)
+    queries = movie_emb[picks].mean(dim=1)
+
+    start = time.perf_counter()
+    index = IVFIndex(movie_emb, nlist=args.nlist)
+    build_s = time.perf_counter() - start
+    print(f"{source}: {len(movie_emb)} movies, nlist={index.nlist}, build {build_s:.2f}s")
+
+    exact = exact_topk(movie_emb, queries, args.k)
+    rows = [{"mode": "exact", "recall": 1.0,
+             **time_per_query(lambda q: exact_topk(movie_emb, q, args.k), queries, args.batch_size)}]
+    for nprobe in [1, 2, 4, 8, 16, 32, 64]:
+        if nprobe > index.nlist:
+            break
+        approx = ivf_topk(index, movie_emb, queries, args.k, nprobe)
+        rows.append({
+            "mode": f"ivf nprobe={nprobe}",
+            "recall": recall(approx, exact),
+            **time_per_query(lambda q: ivf_topk(index, movie_emb, q, args.k, nprobe),
+                             queries, args.batch_size),
+        })
+    print_table(rows, ["mode", "recall", "p50_ms", "p99_ms", "mean_ms"])
@@ -0,0 +1,55 @@
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks.common import print_table
+from benchmarks.synthetic import write_synthetic_movielens
+
+###############################################################################
+# Peak Memory: In-memory vs Chunked Ratings Ingestion
+###############################################################################
+# Each mode runs in a fresh interpreter so its peak RSS is not polluted by the
+# other one (ru_maxrss only ever grows within a process).
+
+CHILD = """
+import sys, json, time
+from movie_dataset import load_data, peak_rss_mb
+baseline = peak_rss_mb()
+chunksize = int(sys.argv[2]) or None
+start = time.perf_counter()
+data, *_ = load_data(sys.argv[1], use_cache=False, chunksize=chunksize)
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "edges": int(data.edge_index.shape[1]),
+    "baseline_rss_mb": baseline,
+    "peak_rss_mb": peak_rss_mb(),
+}))
+"""
+
+
+def measure(data_dir, chunksize):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, data_dir, str(chunksize)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak RSS of in-memory vs chunked ingestion")
+    parser.add_argument("--data-dir", default=None, help="defaults to a synthetic dataset")
+    parser.add_argument("--synthetic-ratings", type=int, default=10_000_000)
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or write_synthetic_movielens(tmp, args.synthetic_ratings)
+        rows = []
+        for mode, chunksize in [("in-memory", 0), (f"chunked({args.chunksize})", args.chunksize)]:
+            result = measure(data_dir, chunksize)
+            result["mode"] = mode
+            result["ingest_rss_mb"] = result["peak_rss_mb"] - result["baseline_rss_mb"]
+            rows.append(result)
+        print_table(rows, ["mode", "edges", "seconds", "peak_rss_mb", "ingest_rss_mb"])
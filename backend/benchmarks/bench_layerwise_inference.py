@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks.common import print_table
+
+###############################################################################
+# Peak Memory / Time: Full-graph Forward vs Layer-wise Chunked Inference
+###############################################################################
+# Every mode runs in a fresh interpreter (ru_maxrss only grows) over the same
+# seeded random bipartite graph and an untrained model with seeded weights,
+# then saves its embeddings so the parent can check they agree.
+
+CHILD = """
+import sys, json, time
+import torch
+from movie_dataset import peak_rss_mb
+from recommender_model import MovieRecommenderEngine
+
+num_users, num_movies, num_edges, feature_dim, chunk_size, threads, out_path = sys.argv[1:]
+num_users, num_movies, num_edges = int(num_users), int(num_movies), int(num_edges)
+chunk_size, threads = int(chunk_size), int(threads)
+torch.set_num_threads(threads)
+
+generator = torch.Generator().manual_seed(0)
+num_nodes = num_users + num_movies
+x = torch.randn(num_nodes, int(feature_dim), generator=generator)
+edge_index = torch.stack([
+    torch.randint(num_users, (num_edges,), generator=generator),
+    torch.randint(num_users, num_nodes, (num_edges,), generator=generator),
+])
+torch.manual_seed(0)
+model = MovieRecommenderEngine(int(feature_dim), 32, 16).eval()
+baseline = peak_rss_mb()
+
+layer_times = []
+start = time.perf_counter()
+with torch.no_grad():
+    if chunk_size:
+        x_emb = model.inference(x, edge_index, chunk_size=chunk_size, layer_times=layer_times)
+    else:
+        x_emb = model(x, edge_index)
+seconds = time.perf_counter() - start
+torch.save(x_emb, out_path)
+print(json.dumps({
+    "seconds": seconds,
+    "conv1_s": layer_times[0] if layer_times else None,
+    "conv2_s": layer_times[1] if layer_times else None,
+    "baseline_rss_mb": baseline,
+    "peak_rss_mb": peak_rss_mb(),
+}))
+"""
+
+
+def measure(args, chunk_size, threads, out_path):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(args.users), str(args.movies), str(args.edges),
+         str(args.feature_dim), str(chunk_size), str(threads), out_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-graph vs layer-wise embedding inference")
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--movies", type=int, default=60_000)
+    parser.add_argument("--edges", type=int, default=20_000_000)
+    parser.add_argument("--feature-dim", type=int, default=20)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[65536, 8192])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count()])
+    args = parser.parse_args()
+
+    import torch
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reference_path = os.path.join(tmp, "full.pt")
+        modes = [("full graph", 0, os.cpu_count(), reference_path)]
+        for chunk_size in args.chunk_sizes:
+            for threads in sorted(set(args.threads)):
+                modes.append((f"layer-wise({chunk_size})", chunk_size, threads,
+                              os.path.join(tmp, f"chunked_{chunk_size}_{threads}.pt")))
+
+        rows = []
+        for mode, chunk_size, threads, out_path in modes:
+            result = measure(args, chunk_size, threads, out_path)
+            result.update(mode=mode, threads=threads,
+                          inference_rss_mb=result["peak_rss_mb"] - result["baseline_rss_mb"])
+            result["max_abs_diff"] = "%.1e" % float(
+                (torch.load(out_path) - torch.load(reference_path)).abs().max()
+            )
+            rows.append(result)
+
+    print(f"{args.users} users, {args.movies} movies, {args.edges} edges")
+    print_table(rows, ["mode", "threads", "seconds", "conv1_s", "conv2_s",
+                       "inference_rss_mb", "max_abs_diff"])
@@ -0,0 +1,160 @@
+import os
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+import torch
+
+from movie_dataset import load_data
+from benchmarks.common import time_call, print_table
+from benchmarks.synthetic import write_synthetic_movielens
+
+###############################################################################
+# Reference Implementation (row-by-row, kept for comparison only)
+###############################################################################
+
+
+def legacy_load_data(data_dir='./movie_lens_db'):
+    from torch_geometric.data import Data
+
+    df_movies = pd.read_csv(os.path.join(data_dir, 'movies.csv'))
+    # dropna() keeps the pandas 2.x stack() behaviour on newer pandas
+    genres = df_movies['genres'].str.split('|').apply(pd.Series).stack().dropna().unique()
+    df_genres = pd.DataFrame(genres, columns=['genre'])
+    df_genres['genreId'] = df_genres.index
+
+    df_movie_genre = df_movies[['movieId', 'genres']].copy()
+    df_movie_genre['genres'] = df_movie_genre['genres'].str.split('|').apply(
+        lambda x: [df_genres[df_genres['genre'] == i].genreId.values[0] for i in x]
+    )
+    df_movie_genre = df_movie_genre.explode('genres')
+    df_movie_genre.rename(columns={'genres': 'genreId'}, inplace=True)
+    df_movie_genre.reset_index(drop=True, inplace=True)
+    df_movies.drop(columns=['genres'], inplace=True)
+
+    df_ratings = pd.read_csv(os.path.join(data_dir, 'ratings.csv'))
+    df_ratings['ratingId'] = df_ratings.index
+    df_ratings['timestamp'] = pd.to_datetime(
+        df_ratings['timestamp'], unit='s'
+    ).dt.strftime('%Y-%m-%d').astype('datetime64[s]')
+    df_ratings.rename(columns={'timestamp': 'date'}, inplace=True)
+    df_users = pd.DataFrame(df_ratings['userId'].unique(), columns=['userId'])
+
+    df_ratings_bin = df_ratings.copy()
+    df_ratings_bin['label'] = (df_ratings_bin['rating'] >= 3).astype(int)
+
+    unique_users = df_users['userId'].unique()
+    unique_movies = df_movies['movieId'].unique()
+
+    num_users = len(unique_users)
+    num_movies = len(unique_movies)
+
+    user2node = {uid: i for i, uid in enumerate(unique_users)}
+    movie2node = {mid: (num_users + i) for i, mid in enumerate(unique_movies)}
+
+    total_nodes = num_users + num_movies
+
+    edge_user = []
+    edge_movie = []
+    edge_label = []
+
+    for row in df_ratings_bin.itertuples(index=False):
+        edge_user.append(user2node[row.userId])
+        edge_movie.append(movie2node[row.movieId])
+        edge_label.append(row.label)
+
+    edge_user = torch.tensor(edge_user, dtype=torch.long)
+    edge_movie = torch.tensor(edge_movie, dtype=torch.long)
+    edge_label = torch.tensor(edge_label, dtype=torch.float)
+    edge_index = torch.stack([edge_user, edge_movie], dim=0)
+
+    n_genres = df_genres.shape[0]
+    movie_genre_mat = np.zeros((num_movies, n_genres), dtype=np.float32)
+
+    for row in df_movie_genre.itertuples(index=False):
+        movie_idx = movie2node[row.movieId] - num_users
+        movie_genre_mat[movie_idx, row.genreId] = 1.0
+
+    user_extra_dim = 0
+    movie_extra_dim = 8
+
+    feature_dim = n_genres + max(user_extra_dim, movie_extra_dim)
+    X = np.zeros((total_nodes, feature_dim), dtype=np.float32)
+
+    for i, uid in enumerate(unique_users):
+        X[i, n_genres:(n_genres + user_extra_dim)] = np.random.randn(user_extra_dim).astype(np.float32)
+
+    for j, mid in enumerate(unique_movies):
+        X[num_users + j, :n_genres] = movie_genre_mat[j]
+
+    x = torch.from_numpy(X).float()
+
+    data = Data(x=x, edge_index=edge_index)
+    data.edge_label = edge_label
+
+    return data, user2node, movie2node, unique_movies, unique_users, feature_dim
+
+
+###############################################################################
+# Benchmark
+###############################################################################
+
+
+def check_equal(new, old):
+    """
+    Assert both loaders produced identical graphs, mappings and features.
+    """
+    data_n, u2n_n, m2n_n, movies_n, users_n, dim_n = new
+    data_o, u2n_o, m2n_o, movies_o, users_o, dim_o = old
+    assert dim_n == dim_o
+    assert torch.equal(data_n.edge_index, data_o.edge_index)
+    assert torch.equal(data_n.edge_label, data_o.edge_label)
+    assert torch.equal(data_n.x, data_o.x)
+    assert np.array_equal(movies_n, movies_o) and np.array_equal(users_n, users_o)
+    assert u2n_n == u2n_o and m2n_n == m2n_o
+
+
+def run(datasets, legacy_limit):
+    rows = []
+    for name, data_dir in datasets:
+        with open(os.path.join(data_dir, 'ratings.csv')) as f:
+            num_ratings = sum(1 for _ in f) - 1
+        new, new_t = time_call(load_data, data_dir, use_cache=False)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            load_data(data_dir, cache_dir=cache_dir)
+            _, snap_t = time_call(load_data, data_dir, cache_dir=cache_dir)
+        row = {
+            "dataset": name,
+            "ratings": num_ratings,
+            "vectorized_s": new_t[0],
+            "snapshot_s": snap_t[0],
+        }
+        if num_ratings <= legacy_limit:
+            old, old_t = time_call(legacy_load_data, data_dir)
+            check_equal(new, old)
+            row["legacy_s"] = old_t[0]
+            row["speedup"] = old_t[0] / new_t[0]
+        else:
+            row["legacy_s"] = "skipped"
+        rows.append(row)
+    print_table(rows, ["dataset", "ratings", "legacy_s", "vectorized_s", "speedup", "snapshot_s"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare load_data against the row-by-row loader")
+    parser.add_argument("--movielens-dir", default="./movie_lens_db")
+    parser.add_argument("--synthetic-ratings", type=int, default=25_000_000)
+    parser.add_argument("--legacy-limit", type=int, default=5_000_000,
+                        help="skip the legacy loader above this many ratings")
+    args = parser.parse_args()
+
+    datasets = []
+    if os.path.exists(os.path.join(args.movielens_dir, 'ratings.csv')):
+        datasets.append(("ml-latest-small", args.movielens_dir))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic_ratings:
+            write_synthetic_movielens(tmp, args.synthetic_ratings)
+            datasets.append((f"synthetic-{args.synthetic_ratings}", tmp))
+        run(datasets, args.legacy_limit)
@@ -0,0 +1,123 @@
+import os
+import asyncio
+import argparse
+import tempfile
+
+###############################################################################
+# GET /movies Pagination: COUNT + OFFSET vs Window Total vs Keyset
+###############################################################################
+# Runs against a throwaway SQLite catalog by default; point DATABASE_URL at a
+# local Postgres (with a populated movies table) to measure that instead.
+
+
+async def seed_catalog(session_factory, num_movies):
+    from sqlalchemy import select, func, insert
+    from database import MovieDB, init_db
+    from benchmarks.synthetic import GENRES
+
+    await init_db()
+    async with session_factory() as db:
+        count = (await db.execute(select(func.count()).select_from(MovieDB))).scalar_one()
+        if count >= num_movies:
+            return
+        await db.execute(insert(MovieDB), [
+            {
+                "id": i + 1,
+                "title": f"Synthetic Movie {i + 1}",
+                "year": str(1950 + i % 70),
+                "genres": "|".join(GENRES[j % len(GENRES)] for j in range(i % 3 + 1)),
+            }
+            for i in range(num_movies)
+        ])
+        await db.commit()
+
+
+async def legacy_page(db, skip, limit, year=None):
+    """
+    The previous implementation: COUNT query, OFFSET query, ORM objects.
+    """
+    from sqlalchemy import select, func
+    from database import MovieDB
+
+    query = select(MovieDB)
+    if year:
+        query = query.where(MovieDB.year == year)
+    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
+    movies = (await db.execute(query.order_by(MovieDB.id).offset(skip).limit(limit))).scalars().all()
+    return [
+        dict(id=m.id, title=m.title, year=m.year, genres=m.genres,
+             imdb_id=m.imdb_id, tmdb_id=m.tmdb_id)
+        for m in movies
+    ], total
+
+
+async def window_page(db, skip, limit):
+    """
+    Single query with the total as a COUNT(*) OVER () window column.
+    """
+    from sqlalchemy import select, func
+    from catalog import MOVIE_COLUMNS
+    from database import MovieDB
+
+    stmt = (
+        select(*MOVIE_COLUMNS, func.count().over().label("total"))
+        .order_by(MovieDB.id).offset(skip).limit(limit)
+    )
+    movies = [dict(row._mapping) for row in await db.execute(stmt)]
+    total = movies[0].pop("total") if movies else 0
+    for movie in movies[1:]:
+        del movie["total"]
+    return movies, total
+
+
+async def main(args):
+    from sqlalchemy import select
+    from database import SessionLocal, MovieDB, engine
+    from catalog import movie_filters, fetch_movie_page, count_cache
+    from benchmarks.common import time_call_async, latency_summary, print_table
+
+    await seed_catalog(SessionLocal, args.movies)
+    async with SessionLocal() as db:
+        ids = (await db.execute(select(MovieDB.id).order_by(MovieDB.id))).scalars().all()
+
+        rows = []
+        for depth_name, skip in [("first", 0), ("middle", len(ids) // 2),
+                                 ("last", len(ids) - args.limit)]:
+            after_id = ids[skip - 1] if skip else 0
+            filters = movie_filters()
+
+            legacy, legacy_t = await time_call_async(legacy_page, db, skip, args.limit,
+                                                     repeat=args.repeat)
+            window, window_t = await time_call_async(window_page, db, skip, args.limit,
+                                                     repeat=args.repeat)
+            count_cache.clear()
+            offset, offset_t = await time_call_async(fetch_movie_page, db, filters, (None, None),
+                                                     args.limit, skip=skip, repeat=args.repeat)
+            keyset, keyset_t = await time_call_async(fetch_movie_page, db, filters, (None, None),
+                                                     args.limit, after_id=after_id,
+                                                     repeat=args.repeat)
+            assert legacy == window == offset == keyset
+
+            for mode, timings in [("count+offset (legacy)", legacy_t),
+                                  ("offset+window total", window_t),
+                                  ("offset+cached total", offset_t),
+                                  ("keyset+cached total", keyset_t)]:
+                rows.append({"page": depth_name, "skip": skip, "mode": mode,
+                             **latency_summary(timings)})
+
+    print(f"{engine.url.get_backend_name()}: {len(ids)} movies, limit={args.limit}")
+    print_table(rows, ["page", "skip", "mode", "p50_ms", "p99_ms", "mean_ms"])
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of /movies pagination strategies")
+    parser.add_argument("--movies", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp.name}/catalog.db")
+    asyncio.run(main(args))
+    tmp.cleanup()
@@ -0,0 +1,127 @@
+import argparse
+import tempfile
+from collections import defaultdict
+
+import numpy as np
+import torch
+
+from benchmarks.common import print_table, time_call, latency_summary
+from benchmarks.synthetic import write_synthetic_movielens
+
+###############################################################################
+# Quantized Movie Store: Memory Saved and Ranking Drift vs float32
+###############################################################################
+# Validation users are served the way /recommend serves anyone: a cold-start
+# embedding pooled from the movies they liked in the training split. Drift is
+# the overlap of each quantized top-K with the float32 top-K, plus how often
+# the quantized ranking still finds the held-out validation likes.
+
+
+def validation_users(data, unique_users, unique_movies, num_users, seed=0):
+    """
+    (known movieIds, held-out movieIds) for up to `num_users` users with
+    positive ratings on both sides of the seeded train/val edge split.
+    """
+    from recommender_training import split_edges
+
+    train_idx, val_idx = split_edges(data.edge_index.shape[1], seed=seed)
+    src, dst = data.edge_index
+    num_users_total = len(unique_users)
+    liked = data.edge_label > 0.5
+
+    def liked_by_user(edge_idx):
+        edge_idx = edge_idx[liked[edge_idx]]
+        by_user = defaultdict(list)
+        movie_ids = np.asarray(unique_movies)[(dst[edge_idx] - num_users_total).numpy()]
+        for user, movie in zip(src[edge_idx].tolist(), movie_ids.tolist()):
+            by_user[user].append(movie)
+        return by_user
+
+    train_likes, val_likes = liked_by_user(train_idx), liked_by_user(val_idx)
+    users = [u for u in val_likes if u in train_likes][:num_users]
+    return [(train_likes[u], set(val_likes[u])) for u in users]
+
+
+def store_tensor_mb(engine):
+    tensors = [engine.movie_store.values, engine.movie_store.scale, engine.default_user_emb,
+               getattr(engine, "full_x_emb", None), getattr(engine, "hidden", None)]
+    data = getattr(engine, "data", None)
+    if data is not None:
+        tensors += [data.x, data.edge_index, data.edge_label]
+    return sum(t.numel() * t.element_size() for t in tensors if t is not None) / (1 << 20)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory / ranking drift of quantized movie stores")
+    parser.add_argument("--data-dir", default=None, help="defaults to a synthetic dataset")
+    parser.add_argument("--synthetic-ratings", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--trained", action="store_true",
+                        help="score with ./model weights (needs --data-dir of the training data)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="train/val split seed (default: the model's saved split with "
+                             "--trained, else 0)")
+    args = parser.parse_args()
+
+    # A trained model must be scored on the edges its training held out
+    seed = args.seed
+    if seed is None and args.trained:
+        from recommender_model import load_metadata
+        seed = load_metadata().get("split_seed")
+        if seed is None:
+            parser.error("the model metadata has no split seed (saved before it was recorded); "
+                         "pass the --seed it was trained with")
+    elif seed is None:
+        seed = 0
+
+    from movie_dataset import load_data
+    from recommender_model import MovieRecommenderEngine
+    from recommender_inference import RecommenderEngine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or write_synthetic_movielens(tmp, args.synthetic_ratings)
+        graph = load_data(data_dir)
+    data, user2node, movie2node, unique_movies, unique_users, feature_dim = graph
+    users = validation_users(data, unique_users, unique_movies, args.users, seed=seed)
+    known = [k for k, _ in users]
+    print(f"{len(unique_movies)} movies, {len(users)} validation users, top-{args.k}")
+
+    if args.trained:
+        from recommender_model import load_model_weights
+        model = load_model_weights(feature_dim)
+    else:
+        torch.manual_seed(0)
+        model = MovieRecommenderEngine(feature_dim, 32, 16)
+    rows, reference = [], None
+    for dtype in ["float32", "float16", "int8"]:
+        engine = RecommenderEngine.from_graph(model, *graph, embed_dtype=dtype)
+        engine.prepare_updates()
+        resident_before = store_tensor_mb(engine)
+        engine.drop_graph()
+
+        recs = []
+        timings = []
+        for start in range(0, len(known), args.batch_size):
+            batch = known[start:start + args.batch_size]
+            out, t = time_call(engine.recommend_many, batch, topK=args.k)
+            recs += out
+            timings += t
+        top = [[mid for mid, _ in r] for r in recs]
+        if reference is None:
+            reference = top
+
+        overlap = np.mean([len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(top, reference)])
+        hits = np.mean([len(set(t) & held) / min(len(held), args.k) for t, (_, held) in zip(top, users)])
+        rows.append({
+            "dtype": dtype,
+            "movie_store_mb": engine.movie_store.nbytes / (1 << 20),
+            "resident_mb": resident_before,
+            "after_drop_mb": store_tensor_mb(engine),
+            f"overlap@{args.k}": float(overlap),
+            f"recall@{args.k}": float(hits),
+            "batch_p50_ms": latency_summary(timings)["p50_ms"],
+        })
+    print_table(rows, ["dtype", "movie_store_mb", "resident_mb", "after_drop_mb",
+                       f"overlap@{args.k}", f"recall@{args.k}", "batch_p50_ms"])
@@ -0,0 +1,95 @@
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+from benchmarks.common import latency_summary, print_table
+
+###############################################################################
+# /recommend Throughput: One Scoring Pass per Request vs Micro-batching
+###############################################################################
+# Every client sends requests with distinct known-movie sets, so the result
+# cache never helps and each request really has to be scored. Run from
+# backend/ after training, so ./model holds the weights and embeddings.
+
+
+def random_requests(engine, num_requests, known_per_user=5, seed=0):
+    rng = np.random.default_rng(seed)
+    movies = np.asarray(engine.unique_movies)
+    return [rng.choice(movies, size=known_per_user, replace=False).tolist()
+            for _ in range(num_requests)]
+
+
+async def drive(recommend, requests, concurrency, topK):
+    """
+    `concurrency` clients issue `requests` back to back through `recommend`.
+    Returns (results, per-request latencies, wall time).
+    """
+    results = [None] * len(requests)
+    latencies = []
+    pending = iter(range(len(requests)))
+
+    async def client():
+        for i in pending:
+            start = time.perf_counter()
+            results[i] = await recommend(requests[i], topK)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return results, latencies, time.perf_counter() - start
+
+
+def same_scores(a, b, tol=1e-5):
+    # Batched and single matmuls may round differently, which can swap ties
+    return all(
+        np.allclose([p for _, p in x], [p for _, p in y], atol=tol) for x, y in zip(a, b)
+    )
+
+
+async def main(args):
+    from recommender_inference import RecommenderEngine
+    from request_batcher import RecommendationBatcher
+
+    engine = RecommenderEngine()
+    engine.warm_up()
+    requests = random_requests(engine, args.requests)
+    print(f"{len(engine.unique_movies)} movies, {args.requests} requests, top_k={args.k}")
+
+    async def unbatched(known, topK):
+        return await asyncio.to_thread(engine.recommend_movies_for_user, known, topK)
+
+    rows = []
+    for concurrency in args.concurrency:
+        baseline, latencies, elapsed = await drive(unbatched, requests, concurrency, args.k)
+        rows.append({"concurrency": concurrency, "mode": "per request",
+                     "req_per_s": len(requests) / elapsed, "batch": 1.0,
+                     **latency_summary(latencies)})
+
+        for batch_size in args.batch_sizes:
+            batcher = RecommendationBatcher(lambda: engine, max_batch_size=batch_size,
+                                            max_wait_ms=args.wait_ms)
+            results, latencies, elapsed = await drive(batcher.recommend, requests,
+                                                      concurrency, args.k)
+            await batcher.stop()
+            assert same_scores(results, baseline)
+            stats = batcher.stats()
+            rows.append({"concurrency": concurrency,
+                         "mode": f"batched <= {batch_size}, {args.wait_ms:g}ms",
+                         "req_per_s": len(requests) / elapsed,
+                         "batch": stats["mean_batch_size"],
+                         **latency_summary(latencies)})
+
+    print_table(rows, ["concurrency", "mode", "req_per_s", "batch", "p50_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput/latency of /recommend micro-batching")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args))
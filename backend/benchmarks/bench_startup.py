@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from benchmarks.common import print_table
+
+###############################################################################
+# API Startup: Import Time, Time to First Response and RSS
+###############################################################################
+# Every case is a fresh interpreter (imports are only cold once per process)
+# that imports main, runs the lifespan through TestClient and sends one
+# request. Run from a directory with ./model and point DATABASE_URL at a
+# catalog. Pass --backend to a checkout of an older commit to compare
+# against it with the same cases.
+
+CHILD = r"""
+import sys, json, time, resource
+from fastapi.testclient import TestClient
+
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+method, path, body = json.loads(sys.argv[1])
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    response = client.request(method, path, json=body)
+    first = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "import_s": imported - start,
+    "ready_s": ready - start,
+    "first_response_s": first - start,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "torch": "torch" in sys.modules,
+    "torch_geometric": "torch_geometric" in sys.modules,
+}))
+"""
+
+REQUESTS = {
+    "catalog": ("GET", "/movies/1", None),
+    "recommend": ("POST", "/recommend", {"known_movies": [1, 2, 3], "top_k": 5}),
+}
+
+
+def run_case(backend, request, env, repeat):
+    """
+    Median-of-`repeat` startup numbers for one request and environment.
+    """
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", CHILD, json.dumps(request)],
+            env={**os.environ, "PYTHONPATH": backend, **env},
+            capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    runs.sort(key=lambda r: r["first_response_s"])
+    return runs[len(runs) // 2]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start cost of the API")
+    parser.add_argument("--backend", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="directory to import main from")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = [
+        ("eager, PyG model", "catalog", {"RECOMMENDER_WARMUP": "eager", "RECOMMENDER_TORCHSCRIPT": "0"}),
+        ("eager, TorchScript", "catalog", {"RECOMMENDER_WARMUP": "eager", "RECOMMENDER_TORCHSCRIPT": "1"}),
+        ("lazy", "catalog", {"RECOMMENDER_WARMUP": "lazy"}),
+        ("eager, PyG model", "recommend", {"RECOMMENDER_WARMUP": "eager", "RECOMMENDER_TORCHSCRIPT": "0"}),
+        ("eager, TorchScript", "recommend", {"RECOMMENDER_WARMUP": "eager", "RECOMMENDER_TORCHSCRIPT": "1"}),
+        ("lazy, TorchScript", "recommend", {"RECOMMENDER_WARMUP": "lazy", "RECOMMENDER_TORCHSCRIPT": "1"}),
+    ]
+    rows = []
+    for name, request, env in cases:
+        result = run_case(args.backend, REQUESTS[request], env, args.repeat)
+        rows.append({"mode": name, "first_request": request, **result})
+    print_table(rows, ["mode", "first_request", "status", "import_s", "ready_s",
+                       "first_response_s", "rss_mb", "torch", "torch_geometric"])
@@ -0,0 +1,78 @@
+import os
+import asyncio
+import argparse
+import tempfile
+
+import numpy as np
+
+###############################################################################
+# Title Search: Leading-wildcard ILIKE vs In-process Trigram Index
+###############################################################################
+# Runs against a throwaway SQLite catalog by default; set DATABASE_URL to a
+# local Postgres to compare against its ILIKE instead.
+
+WORDS = [
+    "star", "night", "love", "dark", "city", "man", "woman", "story", "king",
+    "lost", "last", "war", "house", "dead", "life", "blood", "girl", "game",
+    "return", "secret", "island", "summer", "winter", "shadow", "river",
+    "matrix", "godfather", "empire", "dragon", "ghost", "heart", "road",
+]
+QUERIES = ["godfather", "godfater", "dark night", "shadw", "island", "king", "e", "ar"]
+
+
+def synthetic_titles(num_movies, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 5, size=num_movies)
+    return [
+        " ".join(rng.choice(WORDS, size=n)).title() + f" {i}"
+        for i, n in enumerate(lengths)
+    ]
+
+
+async def main(args):
+    from sqlalchemy import select, func, insert
+    from database import SessionLocal, MovieDB, engine, init_db
+    from catalog import movie_filters, fetch_movie_page, search_movie_page, build_search_index, count_cache
+    from benchmarks.common import time_call_async, latency_summary, print_table
+
+    await init_db()
+    async with SessionLocal() as db:
+        count_stmt = select(func.count()).select_from(MovieDB)
+        if (await db.execute(count_stmt)).scalar_one() == 0:
+            await db.execute(insert(MovieDB), [
+                {"id": i + 1, "title": title, "year": str(1950 + i % 70), "genres": "Drama"}
+                for i, title in enumerate(synthetic_titles(args.movies))
+            ])
+            await db.commit()
+
+        _, build_t = await time_call_async(build_search_index, db)
+        print(f"{engine.url.get_backend_name()}: {(await db.execute(count_stmt)).scalar_one()} "
+              f"movies, index built in {build_t[0]:.2f}s")
+
+        rows = []
+        for query in QUERIES:
+            async def ilike():
+                count_cache.clear()
+                return await fetch_movie_page(db, movie_filters(search=query), (None, query), 20)
+
+            (_, ilike_total), ilike_t = await time_call_async(ilike, repeat=args.repeat)
+            (_, index_total), index_t = await time_call_async(search_movie_page, db, query,
+                                                              None, 20, repeat=args.repeat)
+            rows.append({"query": query, "mode": "ilike", "matches": ilike_total,
+                         **latency_summary(ilike_t)})
+            rows.append({"query": query, "mode": "trigram index", "matches": index_total,
+                         **latency_summary(index_t)})
+    print_table(rows, ["query", "mode", "matches", "p50_ms", "p99_ms"])
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of title search strategies")
+    parser.add_argument("--movies", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp.name}/catalog.db")
+    asyncio.run(main(args))
+    tmp.cleanup()
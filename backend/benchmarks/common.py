@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+
+###############################################################################
+# Shared Helpers for the Benchmark Scripts
+###############################################################################
+
+
+def time_call(fn, *args, repeat=1, **kwargs):
+    """
+    Call `fn` `repeat` times and return (last result, list of seconds).
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+async def time_call_async(fn, *args, repeat=1, **kwargs):
+    """
+    `time_call` for coroutine functions: awaits `fn` `repeat` times.
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await fn(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def latency_summary(seconds):
+    """
+    p50 / p99 / mean in milliseconds for a list of per-call timings.
+    """
+    ms = np.asarray(seconds, dtype=np.float64) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+    }
+
+
+def print_table(rows, columns):
+    """
+    Print a list of dicts as a fixed-width table (floats to 3 decimals).
+    """
+    def fmt(value):
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        return str(value)
+
+    cells = [[fmt(row.get(col, "")) for col in columns] for row in rows]
+    widths = [
+        max([len(col)] + [len(r[i]) for r in cells]) for i, col in enumerate(columns)
+    ]
+    print(" | ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    print("-+-".join("-" * w for w in widths))
+    for r in cells:
+        print(" | ".join(c.ljust(w) for c, w in zip(r, widths)))
@@ -0,0 +1,125 @@
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+
+###############################################################################
+# Catalog Load Test: Concurrent Clients against the Async API
+###############################################################################
+# Drives GET /movies (offset, keyset, genre, search), /movies/{id} and
+# /movies/{id}/poster from `--concurrency` concurrent clients and reports
+# throughput, per-endpoint p50/p99 and the DB pool counters.
+#
+# By default the app runs in-process over a seeded throwaway SQLite database;
+# set DATABASE_URL to a local Postgres to load that instead, or pass --url to
+# hit a running server (e.g. uvicorn main:app --workers 4).
+
+SEARCHES = ["movie", "synthetic 12", "synthtic", "movie 99"]
+
+
+def request_mix(num_movies, genres):
+    """
+    Weighted request generators; each returns (endpoint label, path, params).
+    """
+    def offset_page():
+        return "movies?skip", "/movies", {"skip": random.randrange(0, num_movies, 20), "limit": 20}
+
+    def keyset_page():
+        return "movies?after_id", "/movies", {"after_id": random.randrange(num_movies), "limit": 20}
+
+    def genre_page():
+        return "movies?genre", "/movies", {"genre": random.choice(genres), "limit": 20}
+
+    def search_page():
+        return "movies?search", "/movies", {"search": random.choice(SEARCHES), "limit": 20}
+
+    def movie():
+        return "movies/{id}", f"/movies/{random.randint(1, num_movies)}", None
+
+    def poster():
+        return "movies/{id}/poster", f"/movies/{random.randint(1, num_movies)}/poster", None
+
+    return [(offset_page, 3), (keyset_page, 3), (genre_page, 2), (search_page, 2),
+            (movie, 3), (poster, 2)]
+
+
+async def run_load(client, mix, num_requests, concurrency):
+    makers, weights = zip(*mix)
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    remaining = iter(range(num_requests))
+
+    async def worker():
+        for _ in remaining:
+            label, path, params = random.choices(makers, weights)[0]()
+            start = time.perf_counter()
+            response = await client.get(path, params=params)
+            timings[label].append(time.perf_counter() - start)
+            if response.status_code >= 500:
+                errors[label] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return timings, errors, time.perf_counter() - start
+
+
+async def main(args):
+    import httpx
+    from benchmarks.common import latency_summary, print_table
+    from benchmarks.synthetic import GENRES
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+    else:
+        import main as app_main
+        from database import SessionLocal, engine, init_db
+        from benchmarks.bench_movies_pagination import seed_catalog
+
+        await init_db()
+        await seed_catalog(SessionLocal, args.movies)
+        await app_main.prepare_catalog()
+        transport = httpx.ASGITransport(app=app_main.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30)
+
+    mix = request_mix(args.movies, GENRES)
+    async with client:
+        # One unmeasured pass warms the count / poster caches and the pool
+        await run_load(client, mix, min(args.requests, 200), args.concurrency)
+        timings, errors, elapsed = await run_load(client, mix, args.requests, args.concurrency)
+        pool = (await client.get("/db/pool")).json()
+
+    rows = [
+        {"endpoint": label, "requests": len(t), "errors": errors[label], **latency_summary(t)}
+        for label, t in sorted(timings.items())
+    ]
+    every = [s for t in timings.values() for s in t]
+    rows.append({"endpoint": "all", "requests": len(every), "errors": sum(errors.values()),
+                 **latency_summary(every)})
+
+    print(f"{args.requests} requests, concurrency={args.concurrency}: "
+          f"{args.requests / elapsed:.1f} req/s over {elapsed:.2f}s")
+    print_table(rows, ["endpoint", "requests", "errors", "p50_ms", "p99_ms", "mean_ms"])
+    print("pool:", ", ".join(f"{k}={v}" for k, v in pool.items()))
+
+    if not args.url:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test of the catalog API")
+    parser.add_argument("--url", default=None, help="base URL of a running server")
+    parser.add_argument("--movies", type=int, default=50_000,
+                        help="catalog size to seed (and to draw ids from)")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp.name}/catalog.db")
+    asyncio.run(main(args))
+    tmp.cleanup()
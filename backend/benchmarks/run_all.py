@@ -0,0 +1,205 @@
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+###############################################################################
+# Benchmark Suite: Data Loading, Embeddings, Scoring and HTTP in One Table
+###############################################################################
+# Runs offline on a synthetic MovieLens-shaped dataset with a randomly
+# initialised model, so the numbers only depend on the code and the machine.
+# Every case reports throughput and per-call p50/p99; compare two runs of
+# the same command (same --ratings / --seed) to spot regressions. The stage
+# timers recorded by metrics.py along the way are printed after the table.
+#
+# The HTTP cases go through the real app (routing, validation, middleware,
+# result cache, micro-batcher) over httpx's in-process ASGI transport, with
+# a throwaway SQLite catalog and the engine built from the synthetic graph.
+
+SECTIONS = ["load", "embed", "score", "http"]
+
+
+def case(section, name, seconds, items, unit, runs=None):
+    """
+    A table row: `items` processed per call, timed by the list `seconds`.
+    """
+    from benchmarks.common import latency_summary
+
+    return {
+        "section": section,
+        "case": name,
+        "runs": runs or len(seconds),
+        "throughput": items * len(seconds) / sum(seconds),
+        "unit": unit,
+        **latency_summary(seconds),
+    }
+
+
+def bench_load(data_dir, num_ratings, repeat):
+    from benchmarks.common import time_call
+    from movie_dataset import load_data
+
+    _, parse = time_call(load_data, data_dir, use_cache=False, repeat=repeat)
+    # The first cached call writes the snapshot; time the loads after it
+    graph = load_data(data_dir)
+    _, snapshot = time_call(load_data, data_dir, repeat=repeat)
+    return graph, [
+        case("load", "load_data csv", parse, num_ratings, "ratings/s"),
+        case("load", "load_data snapshot", snapshot, num_ratings, "ratings/s"),
+    ]
+
+
+def bench_embed(model, data, repeat):
+    from benchmarks.common import time_call
+    from recommender_inference import compute_all_embeddings, device
+
+    rows = []
+    for name, chunk_size in [("full forward", None), ("layer-wise 65536", 65536)]:
+        _, t = time_call(compute_all_embeddings, data, model, device,
+                         chunk_size=chunk_size, repeat=repeat)
+        rows.append(case("embed", f"compute_all_embeddings {name}", t, data.num_nodes, "nodes/s"))
+    return rows
+
+
+def bench_score(engine, requests, topK):
+    from benchmarks.common import time_call
+
+    rows = []
+    for batch_size in [1, 64]:
+        timings = []
+        for start in range(0, len(requests), batch_size):
+            _, t = time_call(engine.recommend_many, requests[start:start + batch_size], topK=topK)
+            timings += t
+        rows.append(case("score", f"recommend_many batch={batch_size}", timings,
+                         batch_size, "users/s"))
+    return rows
+
+
+async def drive_http(client, make_request, num_requests, concurrency):
+    """
+    `concurrency` clients send `num_requests` requests made by
+    `make_request(i) -> (method, path, kwargs)`; returns per-request seconds
+    and the wall time.
+    """
+    latencies = []
+    pending = iter(range(num_requests))
+
+    async def worker():
+        for i in pending:
+            method, path, kwargs = make_request(i)
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code < 500, (path, response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def bench_http(engine, requests, num_movies, args):
+    import httpx
+    import recommender_inference
+    from benchmarks.bench_movies_pagination import seed_catalog
+
+    # Serve the synthetic engine instead of building one from ./model
+    recommender_inference._engine = engine
+    import main as app_main
+    from database import SessionLocal, engine as db_engine
+
+    await seed_catalog(SessionLocal, num_movies)
+    await app_main.prepare_catalog()
+    app_main.recommend_batcher.start()
+    transport = httpx.ASGITransport(app=app_main.app)
+
+    topK = args.top_k
+    cases = [
+        ("GET /movies", lambda i: (
+            "GET", "/movies", {"params": {"skip": random.randrange(0, num_movies, 20)}})),
+        ("GET /movies?search", lambda i: (
+            "GET", "/movies", {"params": {"search": f"movie {random.randrange(num_movies)}"}})),
+        ("GET /movies/{id}", lambda i: (
+            "GET", f"/movies/{random.randint(1, num_movies)}", {})),
+        # Distinct known-movie sets: every request misses the result cache
+        ("POST /recommend", lambda i: (
+            "POST", "/recommend", {"json": {"known_movies": requests[i % len(requests)], "top_k": topK}})),
+        ("POST /recommend cached", lambda i: (
+            "POST", "/recommend", {"json": {"known_movies": requests[i % 32], "top_k": topK}})),
+    ]
+
+    rows = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for name, make_request in cases:
+            # Unmeasured warm-up pass (pool, caches, lazy allocations)
+            await drive_http(client, make_request, min(50, args.requests), args.concurrency)
+            if name == "POST /recommend":
+                recommender_inference.recommendation_cache.clear()
+            latencies, wall = await drive_http(client, make_request, args.requests, args.concurrency)
+            row = case("http", name, latencies, 1, "req/s")
+            row["throughput"] = len(latencies) / wall
+            rows.append(row)
+    await app_main.recommend_batcher.stop()
+    await db_engine.dispose()
+    return rows
+
+
+def main(args):
+    import torch
+    from benchmarks.common import print_table
+    from benchmarks.synthetic import write_synthetic_movielens
+    from benchmarks.bench_recommend_batching import random_requests
+    from recommender_model import MovieRecommenderEngine
+    from recommender_inference import RecommenderEngine
+    from movie_dataset import load_data
+    import metrics
+
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    sections = args.sections
+    rows = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = write_synthetic_movielens(os.path.join(tmp, "data"), args.ratings, seed=args.seed)
+        if "load" in sections:
+            graph, load_rows = bench_load(data_dir, args.ratings, args.repeat)
+            rows += load_rows
+        else:
+            graph = load_data(data_dir, use_cache=False)
+        data, user2node, movie2node, unique_movies, unique_users, feature_dim = graph
+        print(f"{args.ratings} ratings: {len(unique_users)} users, {len(unique_movies)} movies")
+
+        model = MovieRecommenderEngine(feature_dim, 32, 16)
+        if "embed" in sections:
+            rows += bench_embed(model, data, args.repeat)
+
+        engine = RecommenderEngine.from_graph(model, *graph)
+        engine.warm_up()
+        requests = random_requests(engine, args.requests, seed=args.seed)
+        if "score" in sections:
+            rows += bench_score(engine, requests, args.top_k)
+        if "http" in sections:
+            rows += asyncio.run(bench_http(engine, requests, len(unique_movies), args))
+
+    print_table(rows, ["section", "case", "runs", "throughput", "unit", "p50_ms", "p99_ms"])
+    print()
+    stages = [{"stage": stage, **stats} for stage, stats in sorted(metrics.stage_stats().items())]
+    print_table(stages, ["stage", "count", "sum_s", "mean_ms", "p50_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark suite on synthetic data")
+    parser.add_argument("--ratings", type=int, default=1_000_000)
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=SECTIONS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp.name}/catalog.db")
+    main(args)
+    tmp.cleanup()
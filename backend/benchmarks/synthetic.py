@@ -0,0 +1,72 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+###############################################################################
+# Synthetic MovieLens-shaped Dataset
+###############################################################################
+# Writes movies.csv / ratings.csv with the same columns as ml-latest-small so
+# every benchmark can run offline at any scale. Movie popularity follows a
+# Zipf-like curve and users have long-tailed activity, like the real dumps.
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Children", "Comedy", "Crime",
+    "Documentary", "Drama", "Fantasy", "Film-Noir", "Horror", "IMAX",
+    "Musical", "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western",
+]
+
+
+def write_synthetic_movielens(out_dir, num_ratings, num_users=None,
+                              num_movies=None, chunk_size=2_000_000, seed=0):
+    """
+    Write a synthetic MovieLens-style dataset into `out_dir` and return it.
+    Users and movies default to roughly the 25M dump's ratios.
+    """
+    rng = np.random.default_rng(seed)
+    num_users = num_users or max(10, num_ratings // 150)
+    num_movies = num_movies or max(10, num_ratings // 400)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Sparse, non-contiguous movieIds like the real catalog
+    movie_ids = np.sort(rng.choice(num_movies * 4, size=num_movies, replace=False)) + 1
+    n_genres = rng.integers(1, 4, size=num_movies)
+    genres = [
+        "|".join(rng.choice(GENRES, size=k, replace=False)) for k in n_genres
+    ]
+    genres[0] = "(no genres listed)"
+    pd.DataFrame({
+        "movieId": movie_ids,
+        "title": [f"Synthetic Movie {mid} ({1950 + mid % 70})" for mid in movie_ids],
+        "genres": genres,
+    }).to_csv(os.path.join(out_dir, "movies.csv"), index=False)
+
+    movie_p = 1.0 / np.arange(1, num_movies + 1) ** 0.8
+    movie_p /= movie_p.sum()
+    user_p = rng.pareto(1.5, size=num_users) + 1.0
+    user_p /= user_p.sum()
+
+    ratings_path = os.path.join(out_dir, "ratings.csv")
+    written = 0
+    header = True
+    while written < num_ratings:
+        n = min(chunk_size, num_ratings - written)
+        pd.DataFrame({
+            "userId": rng.choice(num_users, size=n, p=user_p) + 1,
+            "movieId": movie_ids[rng.choice(num_movies, size=n, p=movie_p)],
+            "rating": rng.integers(1, 11, size=n) / 2.0,
+            "timestamp": rng.integers(828_000_000, 1_700_000_000, size=n),
+        }).to_csv(ratings_path, index=False, header=header, mode="w" if header else "a")
+        written += n
+        header = False
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic MovieLens-shaped dataset")
+    parser.add_argument("out_dir")
+    parser.add_argument("--ratings", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_synthetic_movielens(args.out_dir, args.ratings, seed=args.seed)
@@ -0,0 +1,159 @@
+import os
+import asyncio
+
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+
+from database import MovieDB, GenreDB, MovieGenreDB, sync_movie_genres
+from result_cache import LRUCache, MISSING
+from search_index import TitleSearchIndex
+
+###############################################################################
+# Catalog Queries
+###############################################################################
+# Movie listings are read as plain column tuples (never ORM objects) and always
+# ordered by id, so a page can be addressed either by OFFSET or by the last id
+# seen (keyset pagination, which stays fast on deep pages).
+
+MOVIE_COLUMNS = (
+    MovieDB.id,
+    MovieDB.title,
+    MovieDB.year,
+    MovieDB.genres,
+    MovieDB.imdb_id,
+    MovieDB.tmdb_id,
+)
+
+# Filtered totals change only when the catalog does; cache them briefly so
+# keyset pages and page-count lookups skip the COUNT query.
+count_cache = LRUCache(
+    maxsize=1024,
+    ttl=float(os.environ.get("CATALOG_COUNT_TTL", "300")),
+)
+
+
+def movie_filters(year=None, search=None, genre_id=None):
+    """
+    WHERE clauses for the optional year filter, title search and genre.
+    The genre filter is an IN over the (genre_id, movie_id) index.
+    """
+    filters = []
+    if year:
+        filters.append(MovieDB.year == year)
+    if search:
+        filters.append(MovieDB.title.ilike(f"%{search}%"))
+    if genre_id is not None:
+        filters.append(MovieDB.id.in_(
+            select(MovieGenreDB.movie_id).where(MovieGenreDB.genre_id == genre_id)
+        ))
+    return filters
+
+
+async def count_movies(db, filters, cache_key):
+    total = count_cache.get(cache_key)
+    if total is MISSING:
+        result = await db.execute(select(func.count()).select_from(MovieDB).where(*filters))
+        total = result.scalar_one()
+        count_cache.set(cache_key, total)
+    return total
+
+
+async def fetch_movie_page(db, filters, cache_key, limit, skip=0, after_id=None):
+    """
+    One page of movies as dicts plus the total number of matches.
+
+    With `after_id`, rows are read by keyset (id > after_id); otherwise by
+    OFFSET. Either way the total comes from `count_cache`, so a page costs a
+    single query once its filter's count is warm. (A COUNT(*) OVER () window
+    was measured too: it materializes every matching row and was slower than
+    the separate COUNT it replaced, see benchmarks/bench_movies_pagination.py.)
+    """
+    stmt = select(*MOVIE_COLUMNS).where(*filters).order_by(MovieDB.id).limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(MovieDB.id > after_id)
+    else:
+        stmt = stmt.offset(skip)
+
+    movies = [dict(row._mapping) for row in await db.execute(stmt)]
+    return movies, await count_movies(db, filters, cache_key)
+
+
+async def fetch_movie(db, movie_id):
+    """
+    A single movie as a dict, or None.
+    """
+    row = (await db.execute(select(*MOVIE_COLUMNS).where(MovieDB.id == movie_id))).first()
+    return dict(row._mapping) if row else None
+
+
+###############################################################################
+# Genres
+###############################################################################
+# Lower-cased genre name -> id, loaded once; genres change only on backfill
+genre_ids = None
+
+
+async def sync_genres(db, attempts=3):
+    """
+    Backfill the normalized genre tables and reload the name -> id map.
+    A backfill that lost a race with another writer (a unique genre name
+    inserted meanwhile) is rolled back and retried on the fresh rows.
+    """
+    global genre_ids
+    for attempt in range(attempts):
+        try:
+            synced = await db.run_sync(sync_movie_genres)
+            break
+        except IntegrityError:
+            await db.rollback()
+            if attempt == attempts - 1:
+                raise
+    genre_ids = {name.lower(): gid for name, gid in synced.items()}
+    return genre_ids
+
+
+async def lookup_genre_id(db, name):
+    """
+    Id of the genre called `name` (case-insensitive), or None if unknown.
+    """
+    if genre_ids is not None:
+        return genre_ids.get(name.lower())
+    result = await db.execute(
+        select(GenreDB.id).where(func.lower(GenreDB.name) == name.lower())
+    )
+    return result.scalar()
+
+
+###############################################################################
+# Title Search
+###############################################################################
+# Built from the movie table at startup; until then (or if building failed)
+# searches fall back to the ILIKE filter above.
+search_index = None
+
+
+async def build_search_index(db):
+    """
+    (Re)build the in-process title index from the current movie table.
+    The CPU-bound build runs in a worker thread, off the event loop.
+    """
+    global search_index
+    rows = (await db.execute(select(MovieDB.id, MovieDB.title, MovieDB.year))).all()
+    search_index = await asyncio.to_thread(TitleSearchIndex, rows)
+    return search_index
+
+
+async def search_movie_page(db, search, year, limit, skip=0):
+    """
+    One page of title-search results, best match first, plus the number of
+    matches. The index ranks and paginates; the DB only fetches the page.
+    The search itself runs in a worker thread, off the event loop.
+    """
+    ids = await asyncio.to_thread(search_index.search, search, year=year)
+    page_ids = ids[skip:skip + limit]
+    if not page_ids:
+        return [], len(ids)
+
+    stmt = select(*MOVIE_COLUMNS).where(MovieDB.id.in_(page_ids))
+    by_id = {row.id: dict(row._mapping) for row in await db.execute(stmt)}
+    return [by_id[mid] for mid in page_ids if mid in by_id], len(ids)
@@ -1,7 +1,10 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float
+import time
+from sqlalchemy import Column, Integer, String, Float, LargeBinary, ForeignKey, Index, select, event, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import deferred
+from metrics import observe, register_collector
 # from dotenv import load_dotenv
 
 # load_dotenv()
@@ -9,29 +12,226 @@ from sqlalchemy.orm import sessionmaker
 # Get Supabase PostgreSQL connection string from environment variable
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
+
+def async_database_url(url):
+    """
+    Point a plain postgres:// or sqlite:// URL at its asyncio driver
+    (asyncpg / aiosqlite); URLs that already name a driver are kept.
+    """
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme:
+        return url
+    if scheme in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if scheme == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+def engine_options(url):
+    """
+    Pool and statement-cache settings, tunable through the environment.
+    """
+    options = {
+        "pool_pre_ping": True,
+        # Compiled-SQL cache shared by every connection
+        "query_cache_size": int(os.environ.get("DB_QUERY_CACHE_SIZE", "500")),
+    }
+    if ":memory:" not in url:
+        options.update(
+            pool_size=int(os.environ.get("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+            pool_recycle=int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+        )
+    if url.startswith("postgresql+asyncpg"):
+        # Server-side prepared statements per connection; set to 0 behind a
+        # transaction-mode pgbouncer (e.g. Supabase's pooler port)
+        options["connect_args"] = {
+            "prepared_statement_cache_size": int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "256")),
+        }
+    return options
+
+
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+
+###############################################################################
+# Pool Metrics
+###############################################################################
+pool_events = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_events["connects"] += 1
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_events["checkouts"] += 1
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_events["checkins"] += 1
+
+
+@event.listens_for(engine.sync_engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_events["invalidations"] += 1
+
+
+def pool_metrics():
+    """
+    Current pool occupancy plus lifetime connection event counts.
+    """
+    pool = engine.pool
+    metrics = dict(pool_events)
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            metrics[name] = getattr(pool, name)()
+    return metrics
+
+
+def _pool_collector():
+    metrics = pool_metrics()
+    return [
+        (f"db_pool_{name}_total", "counter", f"Pool {name} since startup.",
+         [({}, metrics[name])])
+        for name in pool_events
+    ] + [
+        (f"db_pool_{name}", "gauge", f"Pool connections ({name}).", [({}, metrics[name])])
+        for name in ("size", "checkedin", "checkedout", "overflow") if name in metrics
+    ]
+
+
+register_collector(_pool_collector)
+
+
+###############################################################################
+# Query Timing
+###############################################################################
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    # Labelled by statement kind (SELECT, INSERT, ...) to keep cardinality low
+    observe("db_query_duration_seconds", elapsed, statement=statement.lstrip().split(None, 1)[0].upper())
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _on_error(exception_context):
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
 # Define your models
 class MovieDB(Base):
     __tablename__ = "movies"
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
-    year = Column(String)
-    genres = Column(String)
+    year = Column(String, index=True)
+    genres = Column(String)  # pipe-delimited, kept for display
     imdb_id = Column(String, nullable=True)
     tmdb_id = Column(Integer, nullable=True)
+    # Deferred so catalog queries never drag the image bytes along
+    poster_blob = deferred(Column(LargeBinary, nullable=True))
+
+
+# Normalized many-to-many genre relation, derived from MovieDB.genres
+class GenreDB(Base):
+    __tablename__ = "genres"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, index=True, nullable=False)
+
+
+class MovieGenreDB(Base):
+    __tablename__ = "movie_genres"
+
+    movie_id = Column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    genre_id = Column(Integer, ForeignKey("genres.id", ondelete="CASCADE"), primary_key=True)
+
+    # Genre lookups scan (genre_id, movie_id) in id order without touching movies
+    __table_args__ = (Index("ix_movie_genres_genre_movie", "genre_id", "movie_id"),)
+
+
+# Every uvicorn worker runs the schema setup and genre backfill on startup;
+# on Postgres they take this transaction-scoped advisory lock first, so the
+# workers run one after another instead of racing on CREATE INDEX and on the
+# unique genre names (SQLite already serializes writers).
+STARTUP_LOCK_ID = 7_301_338_214
+
+
+def _startup_lock(connection):
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": STARTUP_LOCK_ID})
+
+
+def _create_schema(connection):
+    _startup_lock(connection)
+    Base.metadata.create_all(bind=connection)
+    # create_all() skips indexes on tables that already existed
+    for index in MovieDB.__table__.indexes:
+        index.create(bind=connection, checkfirst=True)
+
+
+async def init_db():
+    """
+    Create missing tables and indexes.
+    """
+    async with engine.begin() as connection:
+        await connection.run_sync(_create_schema)
+
+
+def sync_movie_genres(db):
+    """
+    Backfill `genres` / `movie_genres` from the pipe-delimited MovieDB.genres
+    column, splitting it the same way movie_dataset.load_data does. Only
+    missing rows are inserted, so this is cheap to run on every startup.
+    Returns the {name: id} genre map.
+
+    Takes a synchronous Session; from async code use
+    `await session.run_sync(sync_movie_genres)`. Holds the startup lock
+    until its commit, so concurrent workers see each other's genres.
+    """
+    _startup_lock(db.connection())
+    genre_ids = dict(db.execute(select(GenreDB.name, GenreDB.id)).all())
+    existing = set(db.execute(select(MovieGenreDB.movie_id, MovieGenreDB.genre_id)).all())
+
+    new_links = []
+    for movie_id, genres in db.execute(select(MovieDB.id, MovieDB.genres)):
+        for name in (genres or "").split("|"):
+            if not name:
+                continue
+            if name not in genre_ids:
+                genre = GenreDB(name=name)
+                db.add(genre)
+                db.flush()
+                genre_ids[name] = genre.id
+            link = (movie_id, genre_ids[name])
+            if link not in existing:
+                existing.add(link)
+                new_links.append({"movie_id": link[0], "genre_id": link[1]})
+
+    if new_links:
+        db.bulk_insert_mappings(MovieGenreDB, new_links)
+    db.commit()
+    return genre_ids
 
-# Create tables
-Base.metadata.create_all(bind=engine)
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
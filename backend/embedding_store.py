@@ -0,0 +1,74 @@
+import torch
+
+###############################################################################
+# Movie Embedding Store (float32 / float16 / int8)
+###############################################################################
+# Serving only needs the movie block. It can be held as float16, or as int8
+# with one float32 scale per row (row ~= q * scale, symmetric, scale =
+# max|row| / 127). Scores are computed straight from the stored form, a chunk
+# of rows at a time: int8 rows are widened to float and the per-row scale is
+# applied to the dot products, not to the rows, so no float32 copy of the
+# table ever exists.
+
+DTYPES = ("float32", "float16", "int8")
+
+
+class MovieEmbeddingStore:
+    def __init__(self, movie_emb, dtype="float32", chunk_size=16384):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding dtype {dtype!r}; expected one of {DTYPES}")
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.scale = None
+
+        movie_emb = movie_emb.detach()
+        if dtype == "float32":
+            self.values = movie_emb.float()
+        elif dtype == "float16":
+            self.values = movie_emb.to(torch.float16)
+        else:
+            scale = movie_emb.abs().amax(dim=1) / 127.0
+            scale = torch.where(scale > 0, scale, torch.ones_like(scale))
+            self.values = torch.round(movie_emb / scale.unsqueeze(1)).clamp(-127, 127).to(torch.int8)
+            self.scale = scale.float()
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def dim(self):
+        return self.values.shape[1]
+
+    @property
+    def nbytes(self):
+        scale_bytes = self.scale.numel() * self.scale.element_size() if self.scale is not None else 0
+        return self.values.numel() * self.values.element_size() + scale_bytes
+
+    def rows(self, index):
+        """
+        Float32 rows for `index` (any shape of row numbers) -> [*index.shape, D].
+        """
+        rows = self.values[index].float()
+        if self.scale is not None:
+            rows = rows * self.scale[index].unsqueeze(-1)
+        return rows
+
+    def dequantize(self):
+        if self.dtype == "float32":
+            return self.values
+        return self.rows(torch.arange(len(self), device=self.values.device))
+
+    def dot(self, queries):
+        """
+        Inner products [B, M] of float32 `queries` [B, D] with every row.
+        """
+        if self.dtype == "float32":
+            return queries @ self.values.T
+        out = torch.empty(queries.shape[0], len(self), device=queries.device)
+        for start in range(0, len(self), self.chunk_size):
+            end = min(start + self.chunk_size, len(self))
+            block = queries @ self.values[start:end].float().T
+            if self.scale is not None:
+                block *= self.scale[start:end]
+            out[:, start:end] = block
+        return out
@@ -0,0 +1,77 @@
+import torch
+import torch.nn as nn
+
+###############################################################################
+# TorchScript Inference Graph (no torch_geometric at serving time)
+###############################################################################
+# MovieRecommenderEngine's two SAGEConv layers are mean aggregation plus a
+# root weight: out_i = lin_l(mean_{j -> i} x_j) + lin_r(x_i). SAGELayer
+# computes exactly that with index_add_, and names its parameters like
+# SAGEConv does, so the trained state_dict loads unchanged. The scripted
+# module (forward for embeddings, predict_prob / edge_mlp for scoring) is
+# saved next to the weights and loaded with torch.jit.load alone.
+
+
+class SAGELayer(nn.Module):
+    def __init__(self, in_channels: int, out_channels: int):
+        super().__init__()
+        self.lin_l = nn.Linear(in_channels, out_channels)
+        self.lin_r = nn.Linear(in_channels, out_channels, bias=False)
+
+    def forward(self, x, edge_index):
+        src, dst = edge_index[0], edge_index[1]
+        summed = torch.zeros_like(x).index_add_(0, dst, x.index_select(0, src))
+        degree = torch.zeros(x.size(0), dtype=x.dtype, device=x.device)
+        degree.index_add_(0, dst, torch.ones_like(dst, dtype=x.dtype))
+        mean = summed / degree.clamp(min=1.0).unsqueeze(1)
+        return self.lin_l(mean) + self.lin_r(x)
+
+
+class InferenceGraph(nn.Module):
+    def __init__(self, in_channels: int, hidden_channels: int, out_channels: int):
+        super().__init__()
+        self.conv1 = SAGELayer(in_channels, hidden_channels)
+        self.conv2 = SAGELayer(hidden_channels, out_channels)
+        self.edge_mlp = nn.Sequential(
+            nn.Linear(1, 16),
+            nn.ReLU(),
+            nn.Linear(16, 1)
+        )
+
+    def forward(self, x, edge_index):
+        x = torch.relu(self.conv1(x, edge_index))
+        return self.conv2(x, edge_index)
+
+    @torch.jit.export
+    def predict_prob(self, user_emb, movie_emb):
+        dot = (user_emb * movie_emb).sum(dim=-1, keepdim=True)
+        return torch.sigmoid(self.edge_mlp(dot)).squeeze(-1)
+
+
+def export_inference_graph(model, path):
+    """
+    Script a trained MovieRecommenderEngine's layers and scoring head into
+    `path` (CPU); the exported module is returned.
+    """
+    graph = InferenceGraph(
+        model.conv1.in_channels,
+        model.conv1.out_channels,
+        model.conv2.out_channels,
+    )
+    graph.load_state_dict({k: v.detach().cpu() for k, v in model.state_dict().items()})
+    scripted = torch.jit.script(graph.eval())
+    torch.jit.save(scripted, path)
+    return scripted
+
+
+def load_inference_graph(path):
+    return torch.jit.load(path, map_location="cpu").eval()
+
+
+if __name__ == "__main__":
+    # Export for a model saved before save_model() started doing it
+    from recommender_model import load_model, INFERENCE_GRAPH_PATH
+
+    model, *_ = load_model()
+    export_inference_graph(model, INFERENCE_GRAPH_PATH)
+    print(f"Saved {INFERENCE_GRAPH_PATH}")
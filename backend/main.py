@@ -1,14 +1,125 @@
-from pydantic import BaseModel
+import os
+import time
+import logging
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field, conint
 from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, Response, Query
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, Header, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-from recommender_inference import RecommenderEngine
-from database import MovieDB, get_db
+from request_batcher import RecommendationBatcher
+from result_cache import MISSING
+from database import SessionLocal, get_db, init_db, pool_metrics
+from posters import PosterStore, CACHE_CONTROL, etag_matches
+from metrics import RequestTimer, CONTENT_TYPE, cache_collector, register_collector, render_prometheus
+import catalog
+from catalog import movie_filters, fetch_movie, fetch_movie_page, search_movie_page, lookup_genre_id
 
-app = FastAPI()
+logger = logging.getLogger("uvicorn.error")
+
+
+###############################################################################
+# Application Lifespan
+###############################################################################
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build and warm the recommender once per worker before it starts accepting
+    requests; uvicorn only reports startup complete after this returns.
+    With RECOMMENDER_WARMUP=lazy the ML stack is instead loaded by the first
+    /recommend call, so catalog-only workers start without it.
+    """
+    if os.environ.get("RECOMMENDER_WARMUP", "eager") != "lazy":
+        start = time.perf_counter()
+        await run_in_threadpool(load_recommender)
+        logger.info("Recommender engine ready in %.2fs", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        await init_db()
+    except Exception:
+        logger.exception("Could not create the catalog schema")
+    index = await prepare_catalog()
+    if index is not None:
+        logger.info("Catalog title search index (%d movies) ready in %.2fs",
+                    len(index), time.perf_counter() - start)
+
+    recommend_batcher.start()
+    yield
+    await recommend_batcher.stop()
+
+
+async def prepare_catalog():
+    """
+    Sync the genre tables and build the title search index. Each step fails
+    on its own: the index is built even if the genre sync did not work (genre
+    lookups then query the table), and without it search falls back to ILIKE.
+    Returns the index, or None.
+    """
+    async with SessionLocal() as db:
+        try:
+            await catalog.sync_genres(db)
+        except Exception:
+            logger.exception("Could not sync the genre tables; genre lookups query the DB")
+            await db.rollback()
+        try:
+            return await catalog.build_search_index(db)
+        except Exception:
+            logger.exception("Could not build the title search index; using ILIKE search")
+            return None
+
+
+###############################################################################
+# Recommender Subsystem (imported on first use)
+###############################################################################
+# recommender_inference pulls in torch and the model; nothing else in this
+# module needs them, so it is imported by load_recommender() only.
+recommender = None
+
+
+def load_recommender():
+    """
+    Import recommender_inference and build its engine (blocking; call from a
+    worker thread). Returns the module.
+    """
+    global recommender
+    if recommender is None:
+        import recommender_inference
+
+        recommender_inference.get_engine()
+        caches["recommendation"] = recommender_inference.recommendation_cache
+        recommender = recommender_inference
+    return recommender
+
+
+app = FastAPI(lifespan=lifespan)
+
+poster_store = PosterStore(
+    max_bytes=int(os.environ.get("POSTER_CACHE_BYTES", 64 << 20)),
+    disk_cache_dir=os.environ.get("POSTER_CACHE_DIR"),
+    max_missing=int(os.environ.get("POSTER_MISSING_CACHE_SIZE", "16384")),
+)
+
+# Concurrent /recommend misses are scored together in micro-batches
+recommend_batcher = RecommendationBatcher(
+    lambda: load_recommender().get_engine(),
+    max_batch_size=int(os.environ.get("RECOMMENDER_BATCH_SIZE", "64")),
+    max_wait_ms=float(os.environ.get("RECOMMENDER_BATCH_WAIT_MS", "2")),
+)
+
+# The recommendation cache joins once the recommender is loaded
+caches = {
+    "movie_count": catalog.count_cache,
+    "poster": poster_store.memory,
+    "poster_missing": poster_store.missing,
+}
+register_collector(cache_collector(caches))
+
+# Per-route latency histograms, exposed on /metrics
+app.add_middleware(RequestTimer)
 
 # Add CORS middleware
 app.add_middleware(
@@ -40,65 +151,75 @@ class MovieListResponse(BaseModel):
     movies: List[MovieRead]
     total: int
     pages: int
+    next_cursor: Optional[int] = None
+
+# Upper bound on top_k; larger lists cost a full-catalog topk per request
+MAX_TOP_K = int(os.environ.get("RECOMMENDER_MAX_TOP_K", "100"))
+# movieIds are int32 in the catalog; anything outside is rejected with a 422
+MovieId = conint(ge=0, le=2**31 - 1)
+
 
 class RecommendationRequest(BaseModel):
-    known_movies: List[int] = []
-    top_k: int = 5
+    known_movies: List[MovieId] = []
+    top_k: int = Field(5, ge=1, le=MAX_TOP_K)
+
 
 ###############################################################################
 # List Movies (GET /movies)
 ###############################################################################
 @app.get("/movies", response_model=MovieListResponse)
-def list_movies(
+async def list_movies(
     skip: int = 0,
     limit: int = 20,
     year: Optional[str] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    genre: Optional[str] = None,
+    after_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Return a paginated list of movies from the DB,
-    with optional year filter and title search
+    Return a paginated list of movies from the DB ordered by id,
+    with optional year and genre filters and title search.
+    Pass the previous page's `next_cursor` as `after_id` to page by keyset
+    instead of `skip`, which stays fast however deep the page is.
+    Searches are ranked by relevance (typos tolerated) and paged by `skip`.
     """
-    query = db.query(MovieDB)
-    
-    if year:
-        query = query.filter(MovieDB.year == year)
-    
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(MovieDB.title.ilike(search_term))
-    
-    total = query.count()
-    movies = query.offset(skip).limit(limit).all()
-    
-    movie_list = [
-        MovieRead(
-            id=movie.id,
-            title=movie.title,
-            year=movie.year,
-            genres=movie.genres,
-            imdb_id=movie.imdb_id,
-            tmdb_id=movie.tmdb_id
-        ) 
-        for movie in movies
-    ]
-    
+    genre_id = None
+    if genre:
+        genre_id = await lookup_genre_id(db, genre)
+        if genre_id is None:
+            return MovieListResponse(movies=[], total=0, pages=0)
+
+    if search and catalog.search_index is not None and genre_id is None:
+        movies, total = await search_movie_page(db, search, year, limit, skip=skip)
+        return MovieListResponse(
+            movies=movies,
+            total=total,
+            pages=(total + limit - 1) // limit
+        )
+
+    filters = movie_filters(year, search, genre_id)
+    movies, total = await fetch_movie_page(
+        db, filters, (year, search, genre_id), limit, skip=skip, after_id=after_id
+    )
+    next_cursor = movies[-1]["id"] if len(movies) == limit else None
+
     return MovieListResponse(
-        movies=movie_list,
+        movies=movies,
         total=total,
-        pages=(total + limit - 1) // limit
+        pages=(total + limit - 1) // limit,
+        next_cursor=next_cursor
     )
 
 ###############################################################################
 # Retrieve a Single Movie (GET /movies/{movie_id})
 ###############################################################################
 @app.get("/movies/{movie_id}", response_model=MovieRead)
-def get_movie(movie_id: int, db: Session = Depends(get_db)):
+async def get_movie(movie_id: int, db: AsyncSession = Depends(get_db)):
     """
     Return a single movie by its internal 'movieId'.
     """
-    movie = db.query(MovieDB).filter(MovieDB.id == movie_id).first()
+    movie = await fetch_movie(db, movie_id)
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found.")
     return movie
@@ -107,46 +228,58 @@ def get_movie(movie_id: int, db: Session = Depends(get_db)):
 # Retrieve Movie Poster (BLOB) (GET /movies/{movie_id}/poster)
 ###############################################################################
 @app.get("/movies/{movie_id}/poster")
-def get_movie_poster(movie_id: int, db: Session = Depends(get_db)):
+async def get_movie_poster(
+    movie_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Returns the poster image (if available) for the given movie ID.
     Since we stored it as a BLOB, we fetch it from DB and return as image/jpeg.
+    Posters are served from PosterStore's caches with an ETag, so browsers
+    revalidating an unchanged poster get an empty 304.
     """
-    movie = db.query(MovieDB).filter(MovieDB.id == movie_id).first()
-    if not movie or not movie.poster_blob:
-        # raise HTTPException(status_code=404, detail="No poster available for this movie.")
-        default_poster = open("./posters/default.jpg", "rb").read()
-        return Response(content=default_poster, media_type="image/jpeg")
-    
-    return Response(content=movie.poster_blob, media_type="image/jpeg")
+    poster = await poster_store.get(movie_id, db)
+    if poster is None:
+        raise HTTPException(status_code=404, detail="No poster available for this movie.")
+
+    headers = {"ETag": poster.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, poster.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=poster.content, media_type="image/jpeg", headers=headers)
 
 
 ###############################################################################
 # Filter Movies by Genre (Optional)
 ###############################################################################
 @app.get("/movies/genre/{genre}", response_model=List[MovieRead])
-def list_movies_by_genre(
+async def list_movies_by_genre(
     genre: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    year: Optional[str] = None,
     skip: int = 0,
     limit: int = 50
 ):
     """
-    Filter movies that contain the given genre in the 'genres' string.
-    For example if genres="Adventure|Children|Fantasy",
-    a GET /movies/genre/Fantasy might match.
+    Movies tagged with exactly the given genre (case-insensitive), optionally
+    from one year. For example if genres="Adventure|Children|Fantasy",
+    a GET /movies/genre/Fantasy matches, but GET /movies/genre/Fan does not.
     """
-    query_str = f"%{genre}%"
-    results = db.query(MovieDB).filter(MovieDB.genres.ilike(query_str))\
-        .offset(skip).limit(limit).all()
-    return results
+    genre_id = await lookup_genre_id(db, genre)
+    if genre_id is None:
+        return []
+    movies, _ = await fetch_movie_page(
+        db, movie_filters(year, genre_id=genre_id), (year, None, genre_id),
+        limit, skip=skip
+    )
+    return movies
 
 
 ###############################################################################
 # Recommendation Endpoint
 ###############################################################################
 @app.post("/recommend")
-def get_recommendations(req: RecommendationRequest):
+async def get_recommendations(req: RecommendationRequest):
     """
     Example request body:
     {
@@ -154,25 +287,66 @@ def get_recommendations(req: RecommendationRequest):
       "top_k": 5
     }
     """
-    # Generate top-K recommendations
-    # engine = RecommenderEngine()
-    # top_recs = engine.recommend_movies_for_user(
-    #     known_movie_ids=req.known_movies,
-    #     topK=req.top_k
-    # )
-    top_recs = [(100, 0.97), (101, 0.96), (102, 0.94), (103, 0.91), (104, 0.87)]
+    engine_module = recommender or await run_in_threadpool(load_recommender)
+
+    # Served from the result cache on repeats; misses join the next micro-batch
+    key = engine_module.recommendation_key(req.known_movies, req.top_k)
+    top_recs = engine_module.recommendation_cache.get(key)
+    if top_recs is MISSING:
+        top_recs = tuple(await recommend_batcher.recommend(key[1], topK=req.top_k))
+        engine_module.recommendation_cache.set(key, top_recs)
 
     # Format as JSON-friendly output
-    results = []
-    for (mid, prob) in top_recs:
-        try:
-            results.append({"movieId": int(mid), "score": round(prob, 4)})
-        except:
-            print(f"Movie ID {mid} not found in database.")
-            
+    results = [
+        {"movieId": int(mid), "score": round(prob, 4)}
+        for (mid, prob) in top_recs
+    ]
     return {"recommendations": results}
 
 
+@app.get("/recommend/cache")
+def get_recommendation_cache_stats():
+    """
+    Hit/miss/eviction counters of the /recommend result cache (empty until
+    the recommender has been loaded).
+    """
+    if recommender is None:
+        return {}
+    return recommender.recommendation_cache.stats()
+
+
+@app.get("/recommend/batching")
+def get_recommendation_batching_stats():
+    """
+    Batch sizes and queue-wait / end-to-end latency percentiles of the
+    /recommend micro-batcher.
+    """
+    return recommend_batcher.stats()
+
+
+###############################################################################
+# Database Pool Metrics
+###############################################################################
+@app.get("/db/pool")
+def get_db_pool_metrics():
+    """
+    Connection pool occupancy and checkout/connect counters.
+    """
+    return pool_metrics()
+
+
+###############################################################################
+# Prometheus Metrics (GET /metrics)
+###############################################################################
+@app.get("/metrics")
+def get_metrics():
+    """
+    Request latency, stage timers, DB query times, cache counters and pool
+    occupancy in the Prometheus text exposition format.
+    """
+    return Response(content=render_prometheus(), media_type=CONTENT_TYPE)
+
+
 ###############################################################################
 # Root Endpoint
 ###############################################################################
@@ -0,0 +1,224 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+###############################################################################
+# Stage Timers and Latency Histograms (Prometheus text format)
+###############################################################################
+# Hot paths record into fixed-bucket histograms: one bisect and a few adds
+# under a lock per observation. Point-in-time values (cache counters, pool
+# occupancy) are not recorded here; collectors registered with
+# `register_collector` are asked for them when /metrics is rendered.
+
+# Seconds; covers a sub-millisecond cache hit up to a full 25M-rating load
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+HELP = {
+    "stage_duration_seconds": "Time spent in instrumented stages (loading, embedding, scoring).",
+    "http_request_duration_seconds": "HTTP request latency by route, method and status.",
+    "db_query_duration_seconds": "Database statement execution time by statement kind.",
+}
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def snapshot(self):
+        """
+        Consistent (per-bucket counts, count, sum).
+        """
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+    def quantile(self, q):
+        """
+        Estimate the `q` quantile by interpolating inside its bucket, the way
+        Prometheus' histogram_quantile does.
+        """
+        counts, total, _ = self.snapshot()
+        if not total:
+            return 0.0
+        rank, seen = q * total, 0
+        for slot, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[slot - 1] if slot else 0.0
+                upper = self.buckets[slot] if slot < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def stats(self):
+        _, count, total = self.snapshot()
+        return {
+            "count": count,
+            "sum_s": total,
+            "mean_ms": total / count * 1000.0 if count else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000.0,
+            "p99_ms": self.quantile(0.99) * 1000.0,
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+_collectors = []
+
+
+def histogram(name, **labels):
+    """
+    The histogram for `name` and these labels, created on first use.
+    """
+    key = (name, tuple(sorted(labels.items())))
+    hist = _histograms.get(key)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(key, Histogram())
+    return hist
+
+
+def observe(name, seconds, **labels):
+    histogram(name, **labels).observe(seconds)
+
+
+@contextmanager
+def timed(stage, name="stage_duration_seconds"):
+    """
+    Record the duration of the `with` block under `name{stage=...}`, also
+    when it raises.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, stage=stage)
+
+
+def stage_stats(name="stage_duration_seconds"):
+    """
+    {label value: Histogram.stats()} of every histogram called `name`.
+    """
+    with _histograms_lock:
+        items = [(labels, hist) for (n, labels), hist in _histograms.items() if n == name]
+    return {",".join(str(v) for _, v in labels): hist.stats() for labels, hist in items}
+
+
+def register_collector(collect):
+    """
+    `collect()` returns [(metric name, "counter" | "gauge", help, [(labels
+    dict, value), ...]), ...] and is called on every render.
+    """
+    _collectors.append(collect)
+
+
+###############################################################################
+# Prometheus Exposition
+###############################################################################
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    body = ",".join(
+        '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def render_prometheus():
+    lines = []
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    by_name = {}
+    for (name, labels), hist in items:
+        by_name.setdefault(name, []).append((labels, hist))
+
+    for name, series in by_name.items():
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, hist in series:
+            counts, count, total = hist.snapshot()
+            cumulative = 0
+            for bound, n in zip(hist.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+    for collect in _collectors:
+        for name, kind, help_text, samples in collect():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels.items()))} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def cache_collector(caches):
+    """
+    Collector for {name: LRUCache}: hits, misses, evictions and size.
+    """
+    def collect():
+        stats = {name: cache.stats() for name, cache in caches.items()}
+        return [
+            (f"cache_{field}_total", "counter", f"Cache {field}.",
+             [({"cache": name}, s[field]) for name, s in stats.items()])
+            for field in ("hits", "misses", "evictions", "expirations", "invalidations")
+        ] + [
+            ("cache_entries", "gauge", "Entries currently cached.",
+             [({"cache": name}, s["size"]) for name, s in stats.items()]),
+        ]
+    return collect
+
+
+###############################################################################
+# Request Latency Middleware
+###############################################################################
+class RequestTimer:
+    """
+    ASGI middleware recording http_request_duration_seconds per matched route
+    template (not the raw path, so /movies/{movie_id} is one series), method
+    and status, measured until the response has been handed to the server.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            observe("http_request_duration_seconds", time.perf_counter() - start,
+                    route=route, method=scope["method"], status=status)
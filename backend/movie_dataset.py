@@ -1,88 +1,105 @@
+import os
+import sys
+import glob
+import hashlib
 import torch
 import numpy as np
 import pandas as pd
 
 from torch_geometric.data import Data
 
-def load_data():
+from artifact_store import write_arrays, read_arrays
+from metrics import timed
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Bump when the graph construction below changes, so old snapshots are ignored
+SNAPSHOT_VERSION = 1
+SOURCE_FILES = ('movies.csv', 'ratings.csv')
+
+
+def load_data(data_dir='./movie_lens_db', use_cache=True, cache_dir=None, chunksize=None):
+    """
+    Build the user-movie graph from the MovieLens CSVs in `data_dir`.
+
+    With `use_cache`, the finished graph is stored as a memory-mappable
+    snapshot keyed by a hash of the source CSVs; later calls load that
+    snapshot instead of parsing the CSVs, until the inputs change.
+
+    Set `chunksize` to stream ratings.csv in chunks of that many rows, for
+    rating files too large to hold in memory several times over.
+    """
+    with timed('load_data'):
+        if not use_cache:
+            result = build_graph(data_dir, chunksize)
+            report_peak_rss(chunksize)
+            return result
+
+        cache_dir = cache_dir or os.path.join(data_dir, '.cache')
+        snapshot_path = os.path.join(cache_dir, f'graph_{source_hash(data_dir)}.bin')
+        if os.path.exists(snapshot_path):
+            return load_snapshot(snapshot_path)
+
+        result = build_graph(data_dir, chunksize)
+        save_snapshot(snapshot_path, *result)
+        # Reported after the snapshot write, which is part of the peak
+        report_peak_rss(chunksize)
+        return result
+
+
+def build_graph(data_dir='./movie_lens_db', chunksize=None):
     ###############################################################################
-    # 1) Load CSVs (Same as Before)
+    # 1) Load CSVs
     ###############################################################################
+    # Only the columns the graph needs are parsed; ratings are labelled below,
+    # so the timestamp column is never read.
 
-    df_movies = pd.read_csv('./movie_lens_db/movies.csv')
-    genres = df_movies['genres'].str.split('|').apply(pd.Series).stack().unique()
-    df_genres = pd.DataFrame(genres, columns=['genre'])
-    df_genres['genreId'] = df_genres.index
-
-    df_movie_genre = df_movies[['movieId', 'genres']].copy()
-    df_movie_genre['genres'] = df_movie_genre['genres'].str.split('|').apply(
-        lambda x: [df_genres[df_genres['genre'] == i].genreId.values[0] for i in x]
+    df_movies = pd.read_csv(
+        os.path.join(data_dir, 'movies.csv'),
+        usecols=['movieId', 'genres'],
+        dtype={'movieId': np.int64, 'genres': str},
     )
-    df_movie_genre = df_movie_genre.explode('genres')
-    df_movie_genre.rename(columns={'genres': 'genreId'}, inplace=True)
-    df_movie_genre.reset_index(drop=True, inplace=True)
-    df_movies.drop(columns=['genres'], inplace=True)
-
-    df_ratings = pd.read_csv('./movie_lens_db/ratings.csv')
-    df_ratings['ratingId'] = df_ratings.index
-    df_ratings['timestamp'] = pd.to_datetime(
-        df_ratings['timestamp'], unit='s'
-    ).dt.strftime('%Y-%m-%d').astype('datetime64[s]')
-    df_ratings.rename(columns={'timestamp': 'date'}, inplace=True)
-    df_users = pd.DataFrame(df_ratings['userId'].unique(), columns=['userId'])
+
+    # One row per (movie, genre); factorize numbers genres in order of first
+    # appearance, which matches the previous split/stack/unique ordering.
+    movie_genre = df_movies['genres'].str.split('|').explode()
+    genre_codes, genres = pd.factorize(movie_genre)
+    df_genres = pd.DataFrame({'genre': genres, 'genreId': np.arange(len(genres))})
+
+    unique_movies = df_movies['movieId'].unique()
+    movie_index = pd.Index(unique_movies)
 
     ###############################################################################
-    # 2) Label Ratings (>=3 => 1, <3 => 0)
+    # 2) Build Edge Index & Edge Labels (>=3 => 1, <3 => 0)
     ###############################################################################
-    df_ratings_bin = df_ratings.copy()
-    df_ratings_bin['label'] = (df_ratings_bin['rating'] >= 3).astype(int)
+    # Users are numbered in order of first appearance in ratings.csv and
+    # movies in movies.csv order; movie nodes come after all user nodes.
+    ratings_path = os.path.join(data_dir, 'ratings.csv')
+    if chunksize:
+        edge_index, edge_label, unique_users = read_ratings_chunked(
+            ratings_path, movie_index, chunksize
+        )
+    else:
+        edge_index, edge_label, unique_users = read_ratings(ratings_path, movie_index)
 
     ###############################################################################
     # 3) Map Users & Movies to Node Indices
     ###############################################################################
-    unique_users = df_users['userId'].unique()
-    unique_movies = df_movies['movieId'].unique()
-
     num_users = len(unique_users)
     num_movies = len(unique_movies)
 
-    user2node = {uid: i for i, uid in enumerate(unique_users)}
-    movie2node = {mid: (num_users + i) for i, mid in enumerate(unique_movies)}
+    user2node = dict(zip(unique_users, range(num_users)))
+    movie2node = dict(zip(unique_movies, range(num_users, num_users + num_movies)))
 
     total_nodes = num_users + num_movies
 
     ###############################################################################
-    # 4) Build Edge Lists (Pos/Neg) & Edge Labels
-    ###############################################################################
-    edge_user = []
-    edge_movie = []
-    edge_label = []
-
-    for row in df_ratings_bin.itertuples(index=False):
-        u_node = user2node[row.userId]
-        m_node = movie2node[row.movieId]
-        edge_user.append(u_node)
-        edge_movie.append(m_node)
-        edge_label.append(row.label)
-
-    edge_user = torch.tensor(edge_user, dtype=torch.long)
-    edge_movie = torch.tensor(edge_movie, dtype=torch.long)
-    edge_label = torch.tensor(edge_label, dtype=torch.float)
-
-    # Final edge_index => shape [2, E]
-    edge_index = torch.stack([edge_user, edge_movie], dim=0)
-
-    ###############################################################################
-    # 5) Build Node Features (Movie Genres + Random User Feats)
+    # 4) Build Node Features (Movie Genres + Random User Feats)
     ###############################################################################
     n_genres = df_genres.shape[0]  # e.g. number of unique genres
-    movie_genre_mat = np.zeros((num_movies, n_genres), dtype=np.float32)
-
-    for row in df_movie_genre.itertuples(index=False):
-        mid = row.movieId
-        gid = row.genreId
-        movie_idx = movie2node[mid] - num_users
-        movie_genre_mat[movie_idx, gid] = 1.0
 
     user_extra_dim = 0  # random user features
     movie_extra_dim = 8
@@ -91,21 +108,208 @@ def load_data():
     X = np.zeros((total_nodes, feature_dim), dtype=np.float32)
 
     # Fill user rows with random features in the last `user_extra_dim` columns
-    for i, uid in enumerate(unique_users):
-        random_feat = np.random.randn(user_extra_dim).astype(np.float32)
-        X[i, n_genres:(n_genres + user_extra_dim)] = random_feat
+    X[:num_users, n_genres:(n_genres + user_extra_dim)] = np.random.randn(
+        num_users, user_extra_dim
+    ).astype(np.float32)
 
     # Fill movie rows with multi-hot genre in the first `n_genres` columns
-    for j, mid in enumerate(unique_movies):
-        node_index = num_users + j
-        X[node_index, :n_genres] = movie_genre_mat[j]
+    genre_movie_nodes = num_users + movie_index.get_indexer(
+        df_movies['movieId'].to_numpy()[movie_genre.index]
+    )
+    has_genre = genre_codes >= 0
+    X[genre_movie_nodes[has_genre], genre_codes[has_genre]] = 1.0
 
-    x = torch.from_numpy(X).float()
+    x = torch.from_numpy(X)
 
     ###############################################################################
-    # 6) Create a PyG Data object
+    # 5) Create a PyG Data object
     ###############################################################################
     data = Data(x=x, edge_index=edge_index)
     data.edge_label = edge_label
 
-    return data, user2node, movie2node, unique_movies, unique_users, feature_dim
\ No newline at end of file
+    return data, user2node, movie2node, unique_movies, unique_users, feature_dim
+
+
+###############################################################################
+# Ratings Ingestion
+###############################################################################
+RATINGS_COLUMNS = ['userId', 'movieId', 'rating']
+RATINGS_DTYPES = {'userId': np.int64, 'movieId': np.int64, 'rating': np.float32}
+
+
+def _movie_codes(movie_index, movie_ids):
+    codes = movie_index.get_indexer(movie_ids)
+    if (codes < 0).any():
+        missing = np.asarray(movie_ids)[codes < 0][0]
+        raise KeyError(f"Rated movieId {missing} is missing from movies.csv")
+    return codes
+
+
+def read_ratings(ratings_path, movie_index):
+    """
+    Read the whole ratings file at once.
+    Returns (edge_index [2, E], edge_label [E], unique_users).
+    """
+    df_ratings = pd.read_csv(ratings_path, usecols=RATINGS_COLUMNS, dtype=RATINGS_DTYPES)
+
+    user_codes, unique_users = pd.factorize(df_ratings['userId'])
+    unique_users = unique_users.to_numpy()
+    movie_codes = _movie_codes(movie_index, df_ratings['movieId'])
+
+    # Final edge_index => shape [2, E]
+    edge_index = torch.from_numpy(np.stack([
+        user_codes.astype(np.int64),
+        movie_codes.astype(np.int64) + len(unique_users),
+    ]))
+    edge_label = torch.from_numpy((df_ratings['rating'].to_numpy() >= 3).astype(np.float32))
+    return edge_index, edge_label, unique_users
+
+
+def count_rows(path, block_size=1 << 24):
+    """
+    Number of data rows in a CSV with a header, counted from raw newlines.
+    """
+    newlines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            newlines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        newlines += 1  # no trailing newline after the last row
+    return max(newlines - 1, 0)
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None if unknown).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+def report_peak_rss(chunksize):
+    if chunksize:
+        peak = peak_rss_mb()
+        print(f"Chunked ingestion peak RSS: {'n/a' if peak is None else f'{peak:.1f} MB'}")
+
+
+def read_ratings_chunked(ratings_path, movie_index, chunksize=1_000_000):
+    """
+    Stream the ratings file in `chunksize`-row chunks into preallocated
+    edge_index / edge_label buffers, so peak memory is the final tensors plus
+    one chunk instead of several copies of the whole file.
+    Returns the same (edge_index, edge_label, unique_users) as `read_ratings`.
+    """
+    num_edges = count_rows(ratings_path)
+    edge_index = torch.empty((2, num_edges), dtype=torch.long)
+    edge_label = torch.empty(num_edges, dtype=torch.float)
+    edge_index_np = edge_index.numpy()
+    edge_label_np = edge_label.numpy()
+
+    # Users are discovered chunk by chunk, numbered in order of first appearance
+    user_chunks = []
+    user_index = pd.Index([], dtype=np.int64)
+
+    filled = 0
+    num_chunks = 0
+    reader = pd.read_csv(
+        ratings_path, usecols=RATINGS_COLUMNS, dtype=RATINGS_DTYPES, chunksize=chunksize
+    )
+    for chunk in reader:
+        users = chunk['userId'].to_numpy()
+        user_codes = user_index.get_indexer(users)
+        unseen = user_codes < 0
+        if unseen.any():
+            new_users = pd.unique(users[unseen])
+            user_chunks.append(new_users)
+            user_index = user_index.append(pd.Index(new_users))
+            user_codes[unseen] = user_index.get_indexer(users[unseen])
+
+        end = filled + len(chunk)
+        edge_index_np[0, filled:end] = user_codes
+        edge_index_np[1, filled:end] = _movie_codes(movie_index, chunk['movieId'])
+        edge_label_np[filled:end] = chunk['rating'].to_numpy() >= 3
+        filled = end
+        num_chunks += 1
+
+    if filled != num_edges:
+        edge_index = edge_index[:, :filled].clone()
+        edge_label = edge_label[:filled].clone()
+
+    unique_users = np.concatenate(user_chunks) if user_chunks else np.empty(0, dtype=np.int64)
+    # Movie nodes come after every user node, which is only known at the end
+    edge_index[1] += len(unique_users)
+
+    buffer_mb = (edge_index.nbytes + edge_label.nbytes) / (1 << 20)
+    print(f"Chunked ingestion: {filled} ratings in {num_chunks} chunks | "
+          f"edge buffers {buffer_mb:.1f} MB")
+    return edge_index, edge_label, unique_users
+
+
+###############################################################################
+# Graph Snapshot Cache
+###############################################################################
+
+
+def source_hash(data_dir):
+    """
+    Content hash of the source CSVs (plus the snapshot format version).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'v{SNAPSHOT_VERSION}'.encode())
+    for name in SOURCE_FILES:
+        h.update(name.encode())
+        with open(os.path.join(data_dir, name), 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def save_snapshot(path, data, user2node, movie2node, unique_movies, unique_users, feature_dim):
+    """
+    Write the finished graph next to its source hash, replacing stale snapshots.
+    The file is written under a temporary name and renamed into place, so a
+    concurrent reader never sees a partial snapshot.
+    """
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    write_arrays(tmp_path, {
+        'edge_index': data.edge_index.numpy(),
+        'edge_label': data.edge_label.numpy(),
+        'x': data.x.numpy(),
+        'unique_users': np.asarray(unique_users, dtype=np.int64),
+        'unique_movies': np.asarray(unique_movies, dtype=np.int64),
+    }, {'feature_dim': int(feature_dim)})
+    os.replace(tmp_path, path)
+
+    for stale in glob.glob(os.path.join(cache_dir, 'graph_*.bin')):
+        if stale != path:
+            os.remove(stale)
+
+
+def load_snapshot(path):
+    """
+    Load a snapshot written by `save_snapshot`. Tensors are zero-copy views of
+    the memory-mapped file; only the id -> node dicts are rebuilt.
+    """
+    arrays, meta = read_arrays(path)
+    unique_users = arrays['unique_users']
+    unique_movies = arrays['unique_movies']
+    num_users = len(unique_users)
+
+    user2node = dict(zip(unique_users, range(num_users)))
+    movie2node = dict(zip(unique_movies, range(num_users, num_users + len(unique_movies))))
+
+    data = Data(
+        x=torch.from_numpy(arrays['x']),
+        edge_index=torch.from_numpy(arrays['edge_index']),
+    )
+    data.edge_label = torch.from_numpy(arrays['edge_label'])
+
+    return data, user2node, movie2node, unique_movies, unique_users, meta['feature_dim']
@@ -0,0 +1,129 @@
+import os
+import asyncio
+import hashlib
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from database import MovieDB
+from result_cache import LRUCache, MISSING
+
+###############################################################################
+# Poster Serving
+###############################################################################
+# Lookup order for a poster: in-memory LRU (bounded by bytes) -> optional local
+# file cache -> a column-only query for the blob. Movies without a poster are
+# remembered too, in a separate LRU bounded by entry count (they weigh nothing
+# against the byte budget), so they stop hitting the database, and share one
+# default image that is read from disk once.
+
+Poster = namedtuple("Poster", ["content", "etag"])
+
+DEFAULT_POSTER_PATH = "./posters/default.jpg"
+CACHE_CONTROL = "public, max-age=86400"
+
+# Marks a movie known to have no poster of its own
+NO_POSTER = Poster(b"", None)
+
+
+def make_etag(content):
+    return '"' + hashlib.blake2b(content, digest_size=12).hexdigest() + '"'
+
+
+async def fetch_poster_blob(db, movie_id):
+    """
+    Load only the poster column for one movie (None if missing or empty).
+    """
+    result = await db.execute(select(MovieDB.poster_blob).where(MovieDB.id == movie_id))
+    return result.scalar()
+
+
+class PosterStore:
+    def __init__(self, max_bytes=64 << 20, disk_cache_dir=None,
+                 default_path=DEFAULT_POSTER_PATH, max_missing=16384):
+        self.memory = LRUCache(
+            maxsize=1 << 20, maxweight=max_bytes,
+            weigh=lambda poster: len(poster.content),
+        )
+        # Ids known to have no poster (or no movie at all)
+        self.missing = LRUCache(maxsize=max_missing)
+        self.disk_cache_dir = disk_cache_dir
+        if disk_cache_dir:
+            os.makedirs(disk_cache_dir, exist_ok=True)
+        self.default_path = default_path
+        self._default = MISSING
+
+    @property
+    def default(self):
+        """
+        The default poster, read from disk on first use (None if absent).
+        """
+        if self._default is MISSING:
+            if os.path.exists(self.default_path):
+                with open(self.default_path, "rb") as f:
+                    content = f.read()
+                self._default = Poster(content, make_etag(content))
+            else:
+                self._default = None
+        return self._default
+
+    def _disk_path(self, movie_id):
+        return os.path.join(self.disk_cache_dir, f"{movie_id}.jpg")
+
+    def _read_disk(self, movie_id):
+        if not self.disk_cache_dir:
+            return None
+        try:
+            with open(self._disk_path(movie_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, movie_id, content):
+        if not self.disk_cache_dir:
+            return
+        path = self._disk_path(movie_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    async def get(self, movie_id, db):
+        """
+        Poster for `movie_id`, falling back to the default poster.
+        Returns None only when neither exists.
+        """
+        poster = self.memory.get(movie_id)
+        if poster is MISSING and self.missing.get(movie_id) is not MISSING:
+            poster = NO_POSTER
+        if poster is MISSING:
+            content = None
+            if self.disk_cache_dir:
+                content = await asyncio.to_thread(self._read_disk, movie_id)
+            if content is None:
+                content = await fetch_poster_blob(db, movie_id)
+                if content and self.disk_cache_dir:
+                    await asyncio.to_thread(self._write_disk, movie_id, content)
+            if content:
+                poster = Poster(content, make_etag(content))
+                self.memory.set(movie_id, poster)
+            else:
+                poster = NO_POSTER
+                self.missing.set(movie_id, True)
+
+        if poster is NO_POSTER:
+            return self.default
+        return poster
+
+    def stats(self):
+        return {**self.memory.stats(), "missing": self.missing.stats()}
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True when an If-None-Match header value covers `etag`.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
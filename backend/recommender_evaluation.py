@@ -0,0 +1,212 @@
+import os
+import time
+import argparse
+
+import torch
+from torch_geometric.data import Data
+
+from movie_dataset import load_data
+from recommender_model import load_model, load_metadata
+from recommender_inference import compute_all_embeddings, format_layer_times, device
+from recommender_training import split_edges
+from ann_index import mlp_direction
+
+###############################################################################
+# Offline Top-K Evaluation (Recall@K, NDCG@K, MAP@K)
+###############################################################################
+# Embeddings are computed once, on the training edges only. Every held-out
+# user is then scored against the whole movie catalog in large batches (one
+# matmul per batch); movies the user rated in training are masked out, and
+# the remaining top-K is compared with the movies they liked (rating >= 3) in
+# the held-out split.
+#
+# When edge_mlp is monotonic in the dot product (see ann_index.mlp_direction)
+# ranking by the dot product is exactly ranking by probability, so the head
+# is skipped; otherwise its logit is evaluated unit by unit over a few rows at
+# a time, which stays in cache instead of materialising [B, M, H] activations.
+#
+# Users are embedded the way /recommend embeds them ("pooled": the mean of the
+# movies they liked in training) or taken from the graph embedding ("graph").
+
+
+def _csr(rows, cols, num_rows):
+    """
+    Sort (row, col) pairs by row into a (ptr, cols) CSR pair.
+    """
+    order = torch.argsort(rows, stable=True)
+    ptr = torch.zeros(num_rows + 1, dtype=torch.long)
+    ptr[1:] = torch.cumsum(torch.bincount(rows, minlength=num_rows), dim=0)
+    return ptr, cols[order]
+
+
+def _gather_csr(ptr, cols, users):
+    """
+    (batch row, col) index pairs of the CSR rows `users`.
+    """
+    starts, lengths = ptr[users], ptr[users + 1] - ptr[users]
+    batch_rows = torch.repeat_interleave(torch.arange(len(users)), lengths)
+    offsets = torch.arange(int(lengths.sum())) - torch.repeat_interleave(
+        torch.cumsum(lengths, dim=0) - lengths, lengths
+    )
+    return batch_rows, cols[torch.repeat_interleave(starts, lengths) + offsets]
+
+
+def head_logits_(edge_mlp, scores, rows_per_chunk=8):
+    """
+    Replace the dot products in `scores` [B, M] with edge_mlp's logits, in place.
+    """
+    lin1, _, lin2 = edge_mlp.children()
+    w1 = lin1.weight.view(-1).tolist()
+    b1 = lin1.bias.view(-1).tolist()
+    w2 = lin2.weight.view(-1).tolist()
+    bias = float(lin2.bias)
+    acc = torch.empty(rows_per_chunk, scores.shape[1])
+    unit = torch.empty_like(acc)
+    for begin in range(0, scores.shape[0], rows_per_chunk):
+        dots = scores[begin:begin + rows_per_chunk]
+        out, tmp = acc[:len(dots)].fill_(bias), unit[:len(dots)]
+        for w, b, v in zip(w1, b1, w2):
+            torch.mul(dots, w, out=tmp)
+            out.add_(tmp.add_(b).clamp_(min=0), alpha=v)
+        dots.copy_(out)
+    return scores
+
+
+def ranking_metrics(hits, num_relevant):
+    """
+    Per-user Recall@K, NDCG@K and AP@K from a [B, K] 0/1 hit matrix (ranked
+    best first) and the number of relevant items of each user.
+    """
+    k = hits.shape[1]
+    positions = torch.arange(1, k + 1, dtype=torch.float32)
+    discounts = 1.0 / torch.log2(positions + 1)
+    capped = num_relevant.clamp(max=k)
+
+    recall = hits.sum(dim=1) / num_relevant
+    ideal = torch.cumsum(discounts, dim=0)[capped - 1]
+    ndcg = (hits * discounts).sum(dim=1) / ideal
+    precision_at_i = torch.cumsum(hits, dim=1) / positions
+    average_precision = (precision_at_i * hits).sum(dim=1) / capped
+    return recall, ndcg, average_precision
+
+
+def user_embeddings(x_emb, train_edges, train_label, num_users, mode="pooled"):
+    if mode == "graph":
+        return x_emb[:num_users]
+    # Mean of the movies each user liked in training; users without any
+    # fall back to the average user, as RecommenderEngine does
+    liked = train_label > 0.5
+    src, dst = train_edges[0, liked], train_edges[1, liked]
+    sums = torch.zeros(num_users, x_emb.shape[1]).index_add_(0, src, x_emb[dst])
+    counts = torch.bincount(src, minlength=num_users).unsqueeze(1)
+    default = x_emb[:num_users].mean(dim=0)
+    return torch.where(counts > 0, sums / counts.clamp(min=1), default)
+
+
+@torch.no_grad()
+def evaluate(model, data, train_idx, eval_idx, num_users, ks=(10, 20), batch_size=2048,
+             user_mode="pooled", chunk_size=None):
+    """
+    Recall@K / NDCG@K / MAP@K (averaged over users with at least one liked
+    held-out movie) for every K in `ks`, plus timings.
+    """
+    model.eval()
+    timings = {}
+    start = time.perf_counter()
+    train_edges = data.edge_index[:, train_idx]
+    train_data = Data(x=data.x, edge_index=train_edges)
+    layer_times = []
+    x_emb = compute_all_embeddings(train_data, model, device, chunk_size=chunk_size,
+                                   layer_times=layer_times)
+    timings["embed_s"] = time.perf_counter() - start
+
+    # Movie nodes follow all user nodes (see movie_dataset.build_graph)
+    movie_emb = x_emb[num_users:]
+    num_movies = movie_emb.shape[0]
+    user_emb = user_embeddings(x_emb, train_edges, data.edge_label[train_idx], num_users, user_mode)
+
+    train_ptr, train_cols = _csr(train_edges[0], train_edges[1] - num_users, num_users)
+    eval_edges = data.edge_index[:, eval_idx[data.edge_label[eval_idx] > 0.5]]
+    relevant_ptr, relevant_cols = _csr(eval_edges[0], eval_edges[1] - num_users, num_users)
+    num_relevant = relevant_ptr[1:] - relevant_ptr[:-1]
+    users = torch.nonzero(num_relevant > 0).squeeze(1)
+
+    direction = mlp_direction(model.edge_mlp)
+    max_k = min(max(ks), num_movies)
+    sums = {k: torch.zeros(3, dtype=torch.float64) for k in ks}
+
+    start = time.perf_counter()
+    for begin in range(0, len(users), batch_size):
+        batch = users[begin:begin + batch_size]
+        scores = user_emb[batch] @ movie_emb.T
+        if direction == 0:
+            head_logits_(model.edge_mlp, scores)
+        elif direction < 0:
+            scores = -scores
+
+        rows, cols = _gather_csr(train_ptr, train_cols, batch)
+        scores[rows, cols] = float("-inf")
+        top = torch.topk(scores, max_k, dim=1).indices
+
+        relevant = torch.zeros(len(batch), num_movies, dtype=torch.bool)
+        rows, cols = _gather_csr(relevant_ptr, relevant_cols, batch)
+        relevant[rows, cols] = True
+        hits = relevant.gather(1, top).float()
+
+        for k in ks:
+            recall, ndcg, ap = ranking_metrics(hits[:, :k], num_relevant[batch])
+            sums[k] += torch.stack([recall.sum(), ndcg.sum(), ap.sum()]).double()
+    timings["score_s"] = time.perf_counter() - start
+
+    results = {
+        k: {name: float(value) / max(len(users), 1)
+            for name, value in zip(("recall", "ndcg", "map"), sums[k])}
+        for k in ks
+    }
+    return results, {"users": len(users), "movies": num_movies, "layer_times": layer_times, **timings}
+
+
+###############################################################################
+# Command Line
+###############################################################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Top-K ranking metrics of the trained model")
+    parser.add_argument("--data-dir", default="./movie_lens_db")
+    parser.add_argument("--ratings-chunksize", type=int, default=None,
+                        help="stream ratings.csv in chunks of this many rows (large dumps)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="edge split seed (default: the one saved with the model)")
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 20])
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--users", choices=["pooled", "graph"], default="pooled")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--embed-chunk-size", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    # Only the training seed reproduces the held-out edges; any other split
+    # mostly "holds out" edges the model was trained on
+    seed = args.seed if args.seed is not None else load_metadata().get("split_seed")
+    if seed is None:
+        parser.error("the model metadata has no split seed (saved before it was recorded); "
+                     "pass the --seed it was trained with")
+
+    torch.set_num_threads(args.threads or os.cpu_count())
+    model, *_ = load_model()
+    data, user2node, movie2node, unique_movies, unique_users, feature_dim = load_data(
+        args.data_dir, chunksize=args.ratings_chunksize)
+    train_idx, val_idx = split_edges(data.edge_index.shape[1], seed=seed)
+
+    results, info = evaluate(model.to(device), data, train_idx, val_idx, len(unique_users),
+                             ks=args.k, batch_size=args.batch_size, user_mode=args.users,
+                             chunk_size=args.embed_chunk_size)
+    print(f"{info['users']} users x {info['movies']} movies | "
+          f"embeddings {info['embed_s']:.2f}s | scoring {info['score_s']:.2f}s")
+    if info["layer_times"]:
+        print(f"Layer-wise embeddings: {format_layer_times(info['layer_times'])}")
+    for k, metrics in results.items():
+        print(f"K={k:<3d} | Recall: {metrics['recall']:.4f} | "
+              f"NDCG: {metrics['ndcg']:.4f} | MAP: {metrics['map']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
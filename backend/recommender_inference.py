@@ -1,44 +1,582 @@
+import os
+import copy
+import logging
+import threading
+
+import numpy as np
 import torch
-from recommender_model import load_model
-from movie_dataset import load_data
+from recommender_model import (
+    MovieRecommenderEngine, load_model, load_model_weights, load_embeddings,
+    EMBEDDINGS_PATH, INFERENCE_GRAPH_PATH,
+)
+from inference_graph import load_inference_graph
+from ann_index import IVFIndex, mlp_direction
+from embedding_store import MovieEmbeddingStore
+from result_cache import LRUCache
+from metrics import timed
+
+logger = logging.getLogger(__name__)
 
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
+def format_layer_times(layer_times):
+    return ", ".join(f"conv{i + 1} {t:.2f}s" for i, t in enumerate(layer_times))
+
+
 @torch.no_grad()
-def compute_all_embeddings(data, model, device):
-    model.eval()
-    data = data.to(device)
-    x_emb = model(data.x, data.edge_index)
-    return x_emb.cpu()
+def compute_all_embeddings(data, model, device, chunk_size=None, num_threads=None, layer_times=None):
+    """
+    Final embeddings of every node. With `chunk_size` (or EMBED_CHUNK_SIZE),
+    run the exact layer-wise chunked inference instead of one full-graph
+    forward, bounding peak memory; per-layer timings are logged and appended
+    to `layer_times` when given (the scripts print them). With
+    `num_threads` (or EMBED_NUM_THREADS) torch's intra-op thread count is
+    set for this call only and restored afterwards; otherwise it is left
+    as the process has it.
+    """
+    chunk_size = chunk_size or int(os.environ.get("EMBED_CHUNK_SIZE", "0"))
+    num_threads = num_threads or int(os.environ.get("EMBED_NUM_THREADS", "0"))
+    previous_threads = torch.get_num_threads()
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    try:
+        model.eval()
+        data = data.to(device)
+        if not chunk_size:
+            with timed("compute_all_embeddings"):
+                return model(data.x, data.edge_index).cpu()
+
+        layer_times = [] if layer_times is None else layer_times
+        with timed("compute_all_embeddings"):
+            x_emb = model.inference(data.x, data.edge_index, chunk_size=chunk_size, layer_times=layer_times)
+        logger.info("Layer-wise embeddings (%d nodes, chunks of %d, %d threads): %s",
+                    data.num_nodes, chunk_size, torch.get_num_threads(), format_layer_times(layer_times))
+        return x_emb.cpu()
+    finally:
+        torch.set_num_threads(previous_threads)
 
 
 class RecommenderEngine:
-    def __init__(self) -> None:
-        self.model, self.user2node, self.movie2node, self.unique_movies, self.feature_dim = load_model()
-        self.model.to(device)
+    def __init__(self, embeddings_path=EMBEDDINGS_PATH, ann_nprobe=None, ann_nlist=None,
+                 embed_dtype="float32") -> None:
+        # Storage of the movie block: "float32", "float16" or "int8"
+        self.embed_dtype = embed_dtype
+        if os.path.exists(embeddings_path):
+            self._load_artifact(embeddings_path)
+        else:
+            self._build_from_graph()
+        self._freeze()
+
+        self.ann = None
+        if ann_nprobe:
+            self.enable_ann(nprobe=ann_nprobe, nlist=ann_nlist)
+
+    def _load_artifact(self, embeddings_path):
+        """
+        Fast path: memory-map the embeddings exported at training time.
+        Only the (tiny) model weights are read eagerly; embedding pages are
+        faulted in on first use and shared with every other worker process.
+        The TorchScript export is preferred for the weights, so serving never
+        imports torch_geometric (RECOMMENDER_TORCHSCRIPT=0 loads the
+        state_dict into MovieRecommenderEngine instead).
+        """
+        arrays, meta = load_embeddings(embeddings_path)
+        self.embeddings_path = embeddings_path
+        self.feature_dim = meta["feature_dim"]
+        self.source_hash = meta.get("source_hash")
+        self.model_dims = (self.feature_dim, meta["hidden_channels"], meta["out_channels"])
+        if os.environ.get("RECOMMENDER_TORCHSCRIPT", "1") == "1" and os.path.exists(INFERENCE_GRAPH_PATH):
+            self.model = load_inference_graph(INFERENCE_GRAPH_PATH).to(device)
+        else:
+            self.model = load_model_weights(*self.model_dims).to(device)
 
-        self.data, self.user2node, self.movie2node, self.unique_movies, self.unique_users, self.feature_dim = load_data()
-        self.data = self.data.to(device)  
+        self.unique_movies = arrays["movie_ids"]
+        self.unique_users = arrays["user_ids"]
+        self.movie_ids = torch.from_numpy(arrays["movie_ids"])
+        self.movie_store = MovieEmbeddingStore(
+            torch.from_numpy(arrays["movie_emb"]).to(device), self.embed_dtype
+        )
+        self.movie_col = arrays["movie_col"]
+        self.default_user_emb = torch.from_numpy(arrays["default_user_emb"]).to(device)
 
+    def _build_from_graph(self):
+        """
+        Slow path when no artifact has been exported: rebuild the graph from
+        the CSVs and run a full forward pass.
+        """
+        from movie_dataset import load_data
+
+        model, *_ = load_model()
+        self._set_graph(model, *load_data())
         self.full_x_emb = compute_all_embeddings(self.data, self.model, device)
+        self._build_movie_block()
+
+    def _set_graph(self, model, data, user2node, movie2node, unique_movies, unique_users, feature_dim):
+        self.model = model.to(device)
+        self.data = data.to(device)
+        self.user2node, self.movie2node = user2node, movie2node
+        self.unique_movies, self.unique_users = unique_movies, unique_users
+        self.feature_dim = feature_dim
+
+    @classmethod
+    def from_graph(cls, model, data, user2node, movie2node, unique_movies, unique_users, feature_dim,
+                   embed_dtype="float32"):
+        """
+        Engine over an in-memory graph and model, without touching ./model.
+        """
+        engine = cls.__new__(cls)
+        engine.embed_dtype = embed_dtype
+        engine._set_graph(model, data, user2node, movie2node, unique_movies, unique_users, feature_dim)
+        engine.full_x_emb = compute_all_embeddings(engine.data, engine.model, device)
+        engine._build_movie_block()
+        engine._freeze()
+        engine.ann = None
+        return engine
+
+    def _build_movie_block(self):
+        """
+        Gather the movie rows of `full_x_emb` into one contiguous [M, D] block
+        (in `unique_movies` order) plus a dense movieId -> column lookup, so
+        scoring is a single matmul instead of a Python loop over movies.
+        """
+        movie_ids = np.asarray(self.unique_movies, dtype=np.int64)
+        movie_nodes = torch.tensor(
+            [self.movie2node[mid] for mid in self.unique_movies], dtype=torch.long
+        )
+        self.movie_ids = torch.from_numpy(movie_ids)
+        self.movie_store = MovieEmbeddingStore(
+            self.full_x_emb[movie_nodes].contiguous().to(device), self.embed_dtype
+        )
+
+        # movieId -> column in movie_emb (-1 for ids outside the catalog)
+        self.movie_col = np.full(int(movie_ids.max()) + 1, -1, dtype=np.int32)
+        self.movie_col[movie_ids] = np.arange(len(movie_ids), dtype=np.int32)
+
+        # Fallback for users with no usable history: the average training user
+        user_nodes = torch.tensor(
+            [self.user2node[uid] for uid in self.unique_users], dtype=torch.long
+        )
+        self.default_user_emb = self.full_x_emb[user_nodes].mean(dim=0).to(device)
+
+    def _freeze(self):
+        """
+        Put the model in eval mode and turn off `requires_grad` on its
+        parameters and the fallback user embedding, so scoring never builds
+        autograd graphs. Nothing is made read-only: the engine's tensors are
+        simply never written after construction (updates build a new engine,
+        see `with_ratings`). Cross-worker page sharing comes from the
+        memory-mapped artifact, not from this.
+        """
+        self.model.eval()
+        for param in self.model.parameters():
+            param.requires_grad_(False)
+        self.default_user_emb.requires_grad_(False)
+
+    @property
+    def movie_emb(self):
+        """
+        The movie block as float32 [M, D] (a dequantized copy unless the
+        store holds float32).
+        """
+        return self.movie_store.dequantize()
+
+    def drop_graph(self):
+        """
+        Release everything scoring does not read: the graph tensors, the full
+        node-embedding table, the cached hidden layer and the id -> node maps.
+        Only the movie store and the fallback user embedding stay resident;
+        `with_ratings` reloads the graph (from matching CSVs only) if it is
+        needed again.
+        """
+        self.data = None
+        self.full_x_emb = None
+        self.hidden = None
+        self.user2node = self.movie2node = None
+
+    def _update_state(self):
+        """
+        The PyG model, graph, hidden (conv1) layer and final embeddings an
+        incremental update needs, returned without touching this engine. An
+        engine served from the artifact (or after `drop_graph`) loads the
+        graph and the state_dict model here and takes the final embeddings
+        from the artifact. Unless the engine already holds it, the hidden
+        layer is computed by running conv1 alone over every node; conv2 only
+        ever runs for the nodes an update reaches.
+        """
+        model = self.model
+        if not isinstance(model, MovieRecommenderEngine):
+            # The TorchScript graph has no chunked / per-node inference
+            model = load_model_weights(*self.model_dims).to(device)
+            model.eval()
+            for param in model.parameters():
+                param.requires_grad_(False)
 
+        if getattr(self, "data", None) is None:
+            data, user2node, movie2node, unique_movies, unique_users, feature_dim = self._reload_graph()
+            graph = (data.to(device), user2node, movie2node, unique_movies, unique_users, feature_dim)
+            hidden = None
+            full_x_emb = self._artifact_embeddings(user2node, movie2node, data.num_nodes)
+        else:
+            graph = (self.data, self.user2node, self.movie2node,
+                     self.unique_movies, self.unique_users, self.feature_dim)
+            hidden = getattr(self, "hidden", None)
+            full_x_emb = getattr(self, "full_x_emb", None)
+
+        if hidden is None:
+            hidden = model.inference(graph[0].x, graph[0].edge_index, num_layers=1).cpu()
+        return model, graph, hidden, full_x_emb
+
+    def _artifact_embeddings(self, user2node, movie2node, num_nodes):
+        """
+        The exported final embeddings laid out as one row per graph node
+        (the graph `_reload_graph` checked against the artifact).
+        """
+        arrays, _ = load_embeddings(self.embeddings_path)
+        full_x_emb = torch.zeros(num_nodes, arrays["movie_emb"].shape[1])
+        for ids, emb, id2node in [(arrays["movie_ids"], arrays["movie_emb"], movie2node),
+                                  (arrays["user_ids"], arrays["user_emb"], user2node)]:
+            nodes = torch.tensor([id2node[i] for i in ids.tolist()], dtype=torch.long)
+            full_x_emb[nodes] = torch.from_numpy(np.array(emb))
+        return full_x_emb
+
+    def _reload_graph(self, data_dir="./movie_lens_db"):
+        """
+        Rebuild the graph the served embeddings were computed from. The CSVs
+        in `data_dir` must be the ones the artifact was exported from (its
+        recorded source hash); anything else would graft the new ratings onto
+        a different graph than the one being served.
+        """
+        from movie_dataset import SOURCE_FILES, load_data, source_hash
+
+        hint = ("incremental updates need the movie_lens_db the model was trained on, "
+                "or serve with RECOMMENDER_KEEP_GRAPH=1 to keep the graph in memory")
+        if not all(os.path.exists(os.path.join(data_dir, name)) for name in SOURCE_FILES):
+            raise RuntimeError(f"Cannot reload the graph: {data_dir} has no {' / '.join(SOURCE_FILES)}; {hint}")
+        expected = getattr(self, "source_hash", None)
+        if expected is None:
+            raise RuntimeError(f"Cannot reload the graph: the embedding artifact does not record "
+                               f"which CSVs it was built from (re-export it with save_model); {hint}")
+        if source_hash(data_dir) != expected:
+            raise RuntimeError(f"Cannot reload the graph: the CSVs in {data_dir} differ from the ones "
+                               f"the embedding artifact was built from; {hint}")
+        return load_data(data_dir)
+
+    def prepare_updates(self):
+        """
+        Load the graph and cache the hidden layer on this engine up front, so
+        every `with_ratings` call skips that work. This modifies the engine,
+        so call it before the engine starts serving requests.
+        """
+        model, graph, self.hidden, self.full_x_emb = self._update_state()
+        self._set_graph(model, *graph)
+        self._freeze()
 
     @torch.no_grad()
-    def recommend_movies_for_user(self, known_movie_ids, topK=5):
+    def with_ratings(self, user_ids, movie_ids, ratings):
+        """
+        A new engine that also knows the given ratings, computed without a
+        full forward pass. Only nodes within two hops of the new edges can
+        change: conv1 is recomputed for the rated movies (and any new users),
+        then conv2 for those nodes and their out-neighbors. An engine without
+        its graph first reloads it and runs conv1 over every node (see
+        `_update_state`); the returned engine keeps the graph, so later
+        updates start from it.
+
+        Nothing held by this engine is modified: updated rows go into copies
+        of `hidden` / `full_x_emb`, and unchanged tensors are shared. Readers
+        of the old engine keep a consistent view until the new one is swapped
+        in (see `add_ratings`). Users not seen before get new nodes appended
+        after the existing ones; unknown movies raise KeyError.
+        """
+        from torch_geometric.data import Data
+
+        model, graph, old_hidden, old_full_x_emb = self._update_state()
+        data, old_user2node, movie2node, unique_movies, unique_users, feature_dim = graph
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        missing = [mid for mid in movie_ids.tolist() if mid not in movie2node]
+        if missing:
+            raise KeyError(f"Rated movieId {missing[0]} is not in the catalog")
+
+        num_nodes = data.num_nodes
+        user2node = dict(old_user2node)
+        new_users = [uid for uid in dict.fromkeys(user_ids.tolist()) if uid not in user2node]
+        user2node.update(zip(new_users, range(num_nodes, num_nodes + len(new_users))))
+        new_nodes = torch.arange(num_nodes, num_nodes + len(new_users))
+
+        # Append the edges (labelled like load_data: rating >= 3 => 1)
+        src = torch.tensor([user2node[uid] for uid in user_ids.tolist()], dtype=torch.long)
+        dst = torch.tensor([movie2node[mid] for mid in movie_ids.tolist()], dtype=torch.long)
+        labels = torch.from_numpy((np.asarray(ratings, dtype=np.float32) >= 3).astype(np.float32))
+        data_device = data.x.device
+        # New users have all-zero features, as users do in load_data
+        x = torch.cat([data.x, data.x.new_zeros(len(new_users), data.x.shape[1])])
+        edge_index = torch.cat([data.edge_index, torch.stack([src, dst]).to(data_device)], dim=1)
+        edge_label = torch.cat([data.edge_label, labels.to(data_device)])
+
+        # Hop 1: conv1 changes where the in-neighborhood changed (plus new nodes)
+        touched = torch.unique(torch.cat([dst, new_nodes])).to(data_device)
+        hidden = torch.cat([old_hidden, old_hidden.new_empty(len(new_users), old_hidden.shape[1])])
+        hidden[touched.cpu()] = model.layer_for_nodes(0, x, edge_index, touched).cpu()
+
+        # Hop 2: conv2 changes for those nodes and everything they point to
+        is_touched = torch.zeros(len(x), dtype=torch.bool, device=data_device)
+        is_touched[touched] = True
+        out_neighbors = edge_index[1, is_touched[edge_index[0]]]
+        affected = torch.unique(torch.cat([touched, out_neighbors]))
+        full_x_emb = torch.cat([old_full_x_emb,
+                                old_full_x_emb.new_empty(len(new_users), old_full_x_emb.shape[1])])
+        full_x_emb[affected.cpu()] = model.layer_for_nodes(
+            1, hidden.to(data_device), edge_index, affected
+        ).cpu()
+
+        engine = copy.copy(self)
+        engine._set_graph(
+            model, Data(x=x, edge_index=edge_index, edge_label=edge_label), user2node, movie2node,
+            unique_movies, np.concatenate([np.asarray(unique_users, dtype=np.int64),
+                                           np.asarray(new_users, dtype=np.int64)]),
+            feature_dim,
+        )
+        engine.hidden = hidden
+        engine.full_x_emb = full_x_emb
+        engine._build_movie_block()
+        engine._freeze()
+        if self.ann is not None:
+            # Movie vectors moved, so the IVF lists are rebuilt from them
+            engine.enable_ann(nprobe=self.ann.nprobe, nlist=self.ann.nlist)
+        return engine
+
+    def enable_ann(self, nprobe=8, nlist=None):
+        """
+        Build an IVF index over the movie block so recommendations only
+        exactly re-score the movies in the `nprobe` closest lists. Only valid
+        when the scoring head is monotonic in the dot product; otherwise the
+        engine keeps scoring the full catalog.
+        """
+        self.ann_direction = mlp_direction(self.model.edge_mlp)
+        if self.ann_direction == 0:
+            logger.warning("edge_mlp is not monotonic in the dot product; ANN retrieval disabled")
+            self.ann = None
+            return
+        self.ann = IVFIndex(self.movie_store.dequantize(), nlist=nlist, nprobe=nprobe)
+
+    def warm_up(self):
+        """
+        Run one throwaway request so lazy allocations and kernel selection
+        happen before the first real user is served.
+        """
+        self.recommend_movies_for_user(self.unique_movies[:1].tolist(), topK=5)
+
+    def movie_columns(self, movie_ids):
+        """
+        Map raw movieIds to columns of `movie_emb`; unknown ids are dropped.
+        """
+        ids = np.asarray(list(movie_ids), dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < len(self.movie_col))]
+        cols = self.movie_col[ids].astype(np.int64)
+        return torch.from_numpy(np.unique(cols[cols >= 0]))
+
+    def known_index(self, known_movie_ids_batch):
+        """
+        Flatten one list of movieIds per user into (row, col) index tensors
+        over the [B, M] score matrix.
+        """
+        rows, cols = [torch.empty(0, dtype=torch.long)], [torch.empty(0, dtype=torch.long)]
+        for row, known in enumerate(known_movie_ids_batch):
+            known_cols = self.movie_columns(known)
+            rows.append(torch.full_like(known_cols, row))
+            cols.append(known_cols)
+        return torch.cat(rows).to(device), torch.cat(cols).to(device)
+
+    @torch.no_grad()
+    def embed_known_movies(self, known_movie_ids_batch):
+        """
+        Build cold-start user embeddings [B, D] for anonymous users by mean
+        pooling the precomputed embeddings of the movies each one liked.
+
+        The training graph only has user -> movie edges, so a SAGE pass over an
+        ego subgraph would never see the user's movies; pooling the movie rows
+        is both the informative option and a single index_add over the movie rows.
+        """
+        batch_size = len(known_movie_ids_batch)
+        rows, cols = self.known_index(known_movie_ids_batch)
+
+        sums = torch.zeros(batch_size, self.movie_store.dim, device=device)
+        sums.index_add_(0, rows, self.movie_store.rows(cols))
+        counts = torch.bincount(rows, minlength=batch_size).unsqueeze(-1)
+
+        user_embs = sums / counts.clamp(min=1)
+        return torch.where(counts > 0, user_embs, self.default_user_emb)
+
+    @torch.no_grad()
+    def score_users(self, user_embs):
+        """
+        Score a batch of user embeddings [B, D] against every movie at once.
+        Returns probabilities of shape [B, M] (columns follow `movie_ids`).
+        """
+        dot = self.movie_store.dot(user_embs.to(device))
+        logit = self.model.edge_mlp(dot.unsqueeze(-1)).squeeze(-1)
+        return torch.sigmoid(logit)
+
+    @torch.no_grad()
+    def recommend_batch(self, user_embs, known_movie_ids_batch, topK=5):
+        """
+        Top-K recommendations for a batch of users in one pass.
+
+        `user_embs` is [B, D]; `known_movie_ids_batch` holds one iterable of
+        movieIds per user that must not be recommended back. Returns one
+        list of (movieId, prob) per user, sorted by descending prob.
+        """
         self.model.eval()
-        user_idx = self.user2node[1]
-        user_emb = self.full_x_emb[user_idx].unsqueeze(0)
-        
-        predictions = []
-        for mid in self.unique_movies:
-            if mid in known_movie_ids:
-                continue
-            movie_idx = self.movie2node[mid]
-            movie_emb = self.full_x_emb[movie_idx].unsqueeze(0)
-            # Dot product => probability
-            prob = self.model.predict_prob(user_emb, movie_emb).item()
-            predictions.append((mid, prob))
-        
-        # Sort descending
-        predictions.sort(key=lambda x: x[1], reverse=True)
-        return predictions[:topK]
\ No newline at end of file
+        user_embs = user_embs.to(device)
+        rows, cols = self.known_index(known_movie_ids_batch)
+
+        if self.ann is not None:
+            top_probs, top_cols = self._topk_ann(user_embs, rows, cols, topK)
+        else:
+            probs = self.score_users(user_embs)
+            # Mask out known movies with a single scatter over (row, col) indices
+            probs[rows, cols] = -1.0
+            k = max(0, min(topK, probs.shape[1]))
+            top_probs, top_cols = torch.topk(probs, k, dim=1)
+        top_probs, top_cols = top_probs.cpu(), top_cols.cpu()
+
+        results = []
+        for row in range(top_cols.shape[0]):
+            keep = top_probs[row] >= 0
+            mids = self.movie_ids[top_cols[row][keep]].tolist()
+            results.append(list(zip(mids, top_probs[row][keep].tolist())))
+        return results
+
+    def _topk_ann(self, user_embs, known_rows, known_cols, topK):
+        """
+        Pull candidates from the IVF index, then score only those exactly
+        through `edge_mlp`. Padding and known movies get prob -1.
+        """
+        candidates = self.ann.search(user_embs * self.ann_direction)
+        valid = candidates >= 0
+        safe = candidates.clamp(min=0)
+
+        dot = (user_embs.unsqueeze(1) * self.movie_store.rows(safe)).sum(dim=-1)
+        probs = torch.sigmoid(self.model.edge_mlp(dot.unsqueeze(-1)).squeeze(-1))
+
+        # Known movies as flat (row * M + col) codes, tested with one isin
+        num_movies = len(self.movie_store)
+        row_ids = torch.arange(len(user_embs), device=device).unsqueeze(1)
+        is_known = torch.isin(row_ids * num_movies + safe, known_rows * num_movies + known_cols)
+        probs = probs.masked_fill(~valid | is_known, -1.0)
+
+        k = max(0, min(topK, probs.shape[1]))
+        top_probs, top_slots = torch.topk(probs, k, dim=1)
+        return top_probs, safe.gather(1, top_slots)
+
+    @torch.no_grad()
+    def recommend_many(self, known_movie_ids_batch, topK=5):
+        """
+        Top-K recommendations for several anonymous users, one list of
+        known movieIds each, scored in a single batched pass.
+        """
+        with timed("recommend_scoring"):
+            user_embs = self.embed_known_movies(known_movie_ids_batch)
+            return self.recommend_batch(user_embs, known_movie_ids_batch, topK=topK)
+
+    @torch.no_grad()
+    def recommend_movies_for_user(self, known_movie_ids, topK=5):
+        return self.recommend_many([known_movie_ids], topK=topK)[0]
+
+
+###############################################################################
+# Process-wide Engine
+###############################################################################
+_engine = None
+# Bumped on every swap; part of the cache key, so a result computed by an
+# engine that has since been replaced can never be served
+_generation = 0
+_engine_lock = threading.Lock()
+# Serializes add_ratings() so concurrent updates never drop each other's edges
+_update_lock = threading.Lock()
+
+# Results of recent /recommend calls, keyed on the normalized request
+recommendation_cache = LRUCache(
+    maxsize=int(os.environ.get("RECOMMENDER_CACHE_SIZE", "4096")),
+    ttl=float(os.environ.get("RECOMMENDER_CACHE_TTL", "0")) or None,
+)
+
+
+def _build_engine():
+    ann_nprobe = int(os.environ.get("RECOMMENDER_ANN_NPROBE", "0"))
+    with timed("build_engine"):
+        engine = RecommenderEngine(
+            ann_nprobe=ann_nprobe or None,
+            embed_dtype=os.environ.get("RECOMMENDER_EMBED_DTYPE", "float32"),
+        )
+        engine.warm_up()
+        if os.environ.get("RECOMMENDER_KEEP_GRAPH", "0") != "1":
+            engine.drop_graph()
+    return engine
+
+
+def get_engine():
+    """
+    Return the process-wide RecommenderEngine, building and warming it on the
+    first call. Safe to call from several threads at once.
+
+    Set RECOMMENDER_ANN_NPROBE to a positive number of lists to serve from the
+    IVF index instead of scoring the whole catalog, and RECOMMENDER_EMBED_DTYPE
+    to float16 or int8 to hold the movie block quantized. The graph is
+    released after warm-up unless RECOMMENDER_KEEP_GRAPH=1.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _build_engine()
+    return _engine
+
+
+def reload_engine():
+    """
+    Rebuild the engine from the current model and embedding artifact, swap it
+    in, and invalidate every cached recommendation made by the old one.
+    """
+    engine = _build_engine()
+    _swap_engine(engine)
+    return engine
+
+
+def _swap_engine(engine):
+    global _engine, _generation
+    with _engine_lock:
+        _engine = engine
+        _generation += 1
+        recommendation_cache.clear()
+
+
+def recommendation_key(known_movie_ids, topK=5):
+    """
+    Cache key for a request: the same set of known movies and top_k share one
+    entry regardless of order or duplicates. Take it before scoring: the
+    engine generation it carries makes a result that raced with a reload or
+    add_ratings unreachable instead of outliving the cache clear.
+    """
+    return (_generation, tuple(sorted(set(known_movie_ids))), topK)
+
+
+def add_ratings(user_ids, movie_ids, ratings):
+    """
+    Fold new ratings into the served embeddings without a full rebuild: the
+    updated engine is built next to the current one, swapped in with a
+    single assignment while requests keep reading the old one, and the
+    cached recommendations it invalidates are dropped.
+
+    The served engine holds no graph by default, so the first update reloads
+    it from ./movie_lens_db, and from then on the graph, hidden layer and
+    full embedding table stay resident: the new ratings exist nowhere else.
+    Workers that take updates should budget for that memory (and may as
+    well start with RECOMMENDER_KEEP_GRAPH=1); read-only workers never pay it.
+    """
+    with _update_lock:
+        engine = get_engine().with_ratings(user_ids, movie_ids, ratings)
+        _swap_engine(engine)
+    return engine
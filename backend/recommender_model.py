@@ -1,14 +1,29 @@
+import os
+import time
 import torch
 import pickle
+import numpy as np
 import torch.nn as nn
 
-from torch_geometric.nn import SAGEConv
+from artifact_store import write_arrays, read_arrays
+from inference_graph import export_inference_graph
+from metrics import timed
+
+MODEL_DIR = "./model"
+MODEL_PATH = os.path.join(MODEL_DIR, "graph_sage_model.pt")
+METADATA_PATH = os.path.join(MODEL_DIR, "recommender_metadata.pkl")
+EMBEDDINGS_PATH = os.path.join(MODEL_DIR, "embeddings.bin")
+# TorchScript layers + scoring head, loadable without torch_geometric
+INFERENCE_GRAPH_PATH = os.path.join(MODEL_DIR, "inference_graph.pt")
 
 ###############################################################################
 # Custom GraphSAGE Model
 ###############################################################################
 class MovieRecommenderEngine(nn.Module):
     def __init__(self, in_channels, hidden_channels, out_channels):
+        # Imported here so serving from the exported artifacts never loads it
+        from torch_geometric.nn import SAGEConv
+
         super().__init__()
         self.conv1 = SAGEConv(in_channels, hidden_channels)
         self.conv2 = SAGEConv(hidden_channels, out_channels)
@@ -27,6 +42,75 @@ class MovieRecommenderEngine(nn.Module):
         x = self.conv2(x, edge_index)
         return x  # node embeddings
 
+    @torch.no_grad()
+    def inference(self, x, edge_index, chunk_size=65536, max_chunk_edges=1 << 20,
+                  layer_times=None, layer_outputs=None, num_layers=2):
+        """
+        Exact full-graph embeddings computed layer by layer over chunks of
+        destination nodes, so peak memory is bounded by one chunk's edges
+        rather than the whole graph's: conv1 runs for every node and its
+        hidden output is materialized, then conv2 runs on top of it.
+
+        Edges are grouped by destination (CSR) once; each chunk is a
+        bipartite SAGEConv call from all nodes to the chunk's nodes, which is
+        exactly what the full forward computes for those rows. A chunk holds
+        at most `chunk_size` nodes and, unless a single node has more,
+        `max_chunk_edges` incoming edges (ratings pile up on movies, so equal
+        node counts can mean very unequal work). Per-layer wall times and
+        outputs are appended to `layer_times` / `layer_outputs` when given.
+        With `num_layers=1` only conv1 runs and its (ReLU'd) output is returned.
+        """
+        num_nodes = x.shape[0]
+        src, dst = edge_index
+        src = src[torch.argsort(dst)]
+        ptr = torch.zeros(num_nodes + 1, dtype=torch.long, device=x.device)
+        ptr[1:] = torch.cumsum(torch.bincount(dst, minlength=num_nodes), dim=0)
+
+        bounds = []
+        start = 0
+        while start < num_nodes:
+            by_edges = int(torch.searchsorted(ptr, ptr[start] + max_chunk_edges, right=True)) - 1
+            end = min(start + chunk_size, num_nodes, max(by_edges, start + 1))
+            bounds.append((start, end))
+            start = end
+
+        convs = [self.conv1, self.conv2][:num_layers]
+        for i, conv in enumerate(convs):
+            start_time = time.perf_counter()
+            out = torch.empty(num_nodes, conv.out_channels, device=x.device)
+            for start, end in bounds:
+                lo, hi = int(ptr[start]), int(ptr[end])
+                # Destination ids local to the chunk, from the CSR row pointer
+                local_dst = torch.repeat_interleave(
+                    torch.arange(end - start, device=x.device), ptr[start + 1:end + 1] - ptr[start:end]
+                )
+                chunk_edges = torch.stack([src[lo:hi], local_dst])
+                h = conv((x, x[start:end]), chunk_edges, size=(num_nodes, end - start))
+                out[start:end] = torch.relu(h) if conv is self.conv1 else h
+            x = out
+            if layer_times is not None:
+                layer_times.append(time.perf_counter() - start_time)
+            if layer_outputs is not None:
+                layer_outputs.append(out)
+        return x
+
+    @torch.no_grad()
+    def layer_for_nodes(self, layer, x, edge_index, nodes):
+        """
+        Output of SAGE layer `layer` (0 = conv1 + ReLU, 1 = conv2) for the
+        distinct node ids `nodes` only, given that layer's input `x` for every
+        node. Matches the rows the full forward would produce.
+        """
+        conv = [self.conv1, self.conv2][layer]
+        # Dense node -> position lookup; a gather per edge beats isin's sort
+        local = torch.full((x.shape[0],), -1, dtype=torch.long, device=x.device)
+        local[nodes] = torch.arange(len(nodes), device=x.device)
+        dst_local = local[edge_index[1]]
+        keep = dst_local >= 0
+        chunk_edges = torch.stack([edge_index[0, keep], dst_local[keep]])
+        h = conv((x, x[nodes]), chunk_edges, size=(x.shape[0], len(nodes)))
+        return torch.relu(h) if layer == 0 else h
+
     def predict_prob(self, user_emb, movie_emb):
         dot = (user_emb * movie_emb).sum(dim=-1, keepdim=True)
         logit = self.edge_mlp(dot)
@@ -39,9 +123,13 @@ class MovieRecommenderEngine(nn.Module):
 ###############################################################################
 
 
-def save_model(model, user2node, movie2node, unique_movies, feature_dim):
-    # 1) Save the model weights
-    torch.save(model.state_dict(), "./model/graph_sage_model.pt")
+def save_model(model, user2node, movie2node, unique_movies, feature_dim,
+               x_emb=None, unique_users=None, data_dir=None, split_seed=None):
+    os.makedirs(MODEL_DIR, exist_ok=True)
+
+    # 1) Save the model weights, and the same weights as a TorchScript graph
+    torch.save(model.state_dict(), MODEL_PATH)
+    export_inference_graph(model, INFERENCE_GRAPH_PATH)
 
     # 2) Optionally, save your mappings and other metadata
 
@@ -52,29 +140,97 @@ def save_model(model, user2node, movie2node, unique_movies, feature_dim):
         "feature_dim": feature_dim,
         "hidden_channels": 32,
         "out_channels": 16,
+        # Seed of split_edges, so evaluation holds out the same edges
+        "split_seed": split_seed,
     }
-    with open("./model/recommender_metadata.pkl", "wb") as f:
+    with open(METADATA_PATH, "wb") as f:
         pickle.dump(metadata, f)
 
+    # 3) Export the final node embeddings for serving
+    if x_emb is not None:
+        from movie_dataset import source_hash
 
-def load_model():
-
-    # 1) Load any metadata you need
-    with open("./model/recommender_metadata.pkl", "rb") as f:
-        metadata = pickle.load(f)
+        save_embeddings(x_emb, user2node, movie2node, unique_movies,
+                        unique_users, feature_dim,
+                        source_hash=source_hash(data_dir) if data_dir else None)
 
-    user2node = metadata["user2node"]
-    movie2node = metadata["movie2node"]
-    unique_movies = metadata["unique_movies"]
-    feature_dim = metadata["feature_dim"]
-    hidden_channels = metadata["hidden_channels"]
-    out_channels = metadata["out_channels"]
 
-    # 2) Re-instantiate the same model class
+def load_model_weights(feature_dim, hidden_channels=32, out_channels=16):
     model = MovieRecommenderEngine(in_channels=feature_dim, hidden_channels=hidden_channels, out_channels=out_channels)
+    model.load_state_dict(torch.load(MODEL_PATH, map_location="cpu"))
+    model.eval()  # for inference
+    return model
 
-    model.load_state_dict(torch.load("./model/graph_sage_model.pt"))
 
-    model.eval()  # for inference
+def load_metadata():
+    with open(METADATA_PATH, "rb") as f:
+        return pickle.load(f)
+
+
+def load_model():
+    with timed("load_model"):
+        # 1) Load any metadata you need
+        metadata = load_metadata()
+
+        user2node = metadata["user2node"]
+        movie2node = metadata["movie2node"]
+        unique_movies = metadata["unique_movies"]
+        feature_dim = metadata["feature_dim"]
+        hidden_channels = metadata["hidden_channels"]
+        out_channels = metadata["out_channels"]
+
+        # 2) Re-instantiate the same model class
+        model = load_model_weights(feature_dim, hidden_channels, out_channels)
 
     return model, user2node, movie2node, unique_movies, feature_dim
+
+
+###############################################################################
+# Precomputed Embedding Artifact
+###############################################################################
+
+
+def save_embeddings(x_emb, user2node, movie2node, unique_movies, unique_users,
+                    feature_dim, path=EMBEDDINGS_PATH, source_hash=None):
+    """
+    Write the final node embeddings as a flat, memory-mappable file so serving
+    never has to rebuild the graph. Rows are split into a movie block (in
+    `unique_movies` order) and a user block, with compact id -> row arrays.
+    `source_hash` (see movie_dataset.source_hash) records which CSVs the
+    graph was built from, so a later reload can check it has the same ones.
+    """
+    x_emb = x_emb.detach().cpu().numpy().astype(np.float32)
+
+    movie_ids = np.asarray(unique_movies, dtype=np.int64)
+    movie_rows = np.fromiter((movie2node[mid] for mid in unique_movies), dtype=np.int64, count=len(movie_ids))
+    user_ids = np.asarray(unique_users, dtype=np.int64)
+    user_rows = np.fromiter((user2node[uid] for uid in unique_users), dtype=np.int64, count=len(user_ids))
+
+    # movieId -> row of movie_emb (-1 for ids outside the catalog)
+    movie_col = np.full(int(movie_ids.max()) + 1, -1, dtype=np.int32)
+    movie_col[movie_ids] = np.arange(len(movie_ids), dtype=np.int32)
+
+    user_emb = x_emb[user_rows]
+    arrays = {
+        "movie_ids": movie_ids,
+        "movie_col": movie_col,
+        "movie_emb": x_emb[movie_rows],
+        "user_ids": user_ids,
+        "user_emb": user_emb,
+        "default_user_emb": user_emb.mean(axis=0),
+    }
+    meta = {
+        "feature_dim": int(feature_dim),
+        "hidden_channels": 32,
+        "out_channels": int(x_emb.shape[1]),
+        "source_hash": source_hash,
+    }
+    write_arrays(path, arrays, meta)
+
+
+def load_embeddings(path=EMBEDDINGS_PATH):
+    """
+    Memory-map an artifact written by `save_embeddings`.
+    Returns (arrays, meta); see `artifact_store.read_arrays`.
+    """
+    return read_arrays(path)
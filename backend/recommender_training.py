@@ -1,3 +1,7 @@
+import os
+import time
+import argparse
+
 import torch
 import numpy as np
 import torch.nn as nn
@@ -5,92 +9,101 @@ import torch.optim as optim
 from torch_geometric.loader import LinkNeighborLoader
 
 from movie_dataset import load_data
-from recommender_model import MovieRecommenderEngine
+from recommender_model import MovieRecommenderEngine, save_model
+from recommender_inference import compute_all_embeddings, format_layer_times
 
 
 ###############################################################################
 # 7) Train/Val Split (Edge-Level)
 ###############################################################################
-
-data, user2node, movie2node, unique_movies, unique_users, feature_dim = load_data()
-
-num_edges = data.edge_index.shape[1]
-indices = np.arange(num_edges)
-np.random.shuffle(indices)
-
-train_size = int(0.8 * num_edges)
-train_idx = torch.tensor(indices[:train_size], dtype=torch.long)
-val_idx = torch.tensor(indices[train_size:], dtype=torch.long)
+def split_edges(num_edges, train_fraction=0.8, seed=None):
+    """
+    Shuffle edge ids and split them into (train_idx, val_idx) LongTensors.
+    """
+    indices = np.random.default_rng(seed).permutation(num_edges)
+    train_size = int(train_fraction * num_edges)
+    train_idx = torch.tensor(indices[:train_size], dtype=torch.long)
+    val_idx = torch.tensor(indices[train_size:], dtype=torch.long)
+    return train_idx, val_idx
 
 
 ###############################################################################
 # 9) Use LinkNeighborLoader for Mini-Batch Training
 ###############################################################################
-# We'll build two loaders: one for training edges, one for validation edges.
-# Each step, it samples a batch of edges plus the neighbors needed in a subgraph.
-
-from torch_geometric.loader import LinkNeighborLoader
+# One loader for training edges, one for validation edges. Each step samples a
+# batch of edges plus the neighbors needed in a subgraph. With num_workers > 0
+# the sampling and collation run in worker processes that stay alive between
+# epochs and keep `prefetch_factor` batches per worker queued, so the model
+# does not wait on the sampler.
+
+
+def _single_threaded_worker(worker_id):
+    # Workers only sample; leave the cores' intra-op threads to the model
+    torch.set_num_threads(1)
+
+
+def make_loader(data, edge_idx, batch_size=1024, num_neighbors=(10, 10), shuffle=False,
+                num_workers=0, persistent_workers=True, prefetch_factor=2, pin_memory=False):
+    options = {}
+    if num_workers > 0:
+        options.update(
+            persistent_workers=persistent_workers,
+            prefetch_factor=prefetch_factor,
+            worker_init_fn=_single_threaded_worker,
+        )
+    return LinkNeighborLoader(
+        data,
+        num_neighbors=list(num_neighbors),  # up to 10 neighbors at 1-hop and 10 at 2-hop
+        batch_size=batch_size,
+        edge_label_index=data.edge_index[:, edge_idx],
+        edge_label=data.edge_label[edge_idx],
+        shuffle=shuffle,
+        num_workers=num_workers,
+        # Page-locked batches only pay off for host -> GPU copies
+        pin_memory=pin_memory,
+        **options,
+    )
 
-# Training loader
-train_loader = LinkNeighborLoader(
-    data,
-    num_neighbors=[10, 10],  # sample up to 10 neighbors at 1-hop and 10 at 2-hop
-    batch_size=1024,
-    #edge_label_index=(data.edge_index[0, train_idx], data.edge_index[1, train_idx]),
-    edge_label_index = data.edge_index[:, train_idx],
-    edge_label=data.edge_label[train_idx],
-    shuffle=True
-)
-
-# Validation loader
-val_loader = LinkNeighborLoader(
-    data,
-    num_neighbors=[10, 10],
-    batch_size=1024,
-    #edge_label_index=(data.edge_index[0, val_idx], data.edge_index[1, val_idx]),
-    edge_label_index = data.edge_index[:, val_idx],
-    edge_label=data.edge_label[val_idx],
-    shuffle=False
-)
 
 ###############################################################################
-# 10) Initialize Model & Optimizer
+# 11) Training & Evaluation (Mini-Batched)
 ###############################################################################
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+# Both loops time how long they wait for the next batch ("sample") separately
+# from the forward/backward work on it ("compute"); whichever dominates is the
+# bottleneck of the epoch.
 
-model = MovieRecommenderEngine(
-    in_channels=feature_dim,
-    hidden_channels=32,
-    out_channels=16
-).to(device)
 
-criterion = nn.BCELoss()
-optimizer = optim.Adam(model.parameters(), lr=1e-2)
+def score_batch(model, batch_data):
+    """
+    Predicted probabilities for the batch's labelled edges.
+    """
+    # Forward pass on the subgraph
+    x_emb = model(batch_data.x, batch_data.edge_index)
 
-###############################################################################
-# 11) Training & Evaluation (Mini-Batched)
-###############################################################################
-def train_epoch(loader):
+    # The loader automatically renumbers nodes in the subgraph,
+    # so batch_data.edge_label_index references subgraph node indices.
+    user_emb = x_emb[batch_data.edge_label_index[0]]
+    movie_emb = x_emb[batch_data.edge_label_index[1]]
+    return model.predict_prob(user_emb, movie_emb)
+
+
+def train_epoch(model, loader, optimizer, criterion, device, score=score_batch):
     model.train()
     total_loss = 0
     total_edges = 0
+    sample_s = compute_s = 0.0
 
+    ready = time.perf_counter()
     for batch_data in loader:
+        fetched = time.perf_counter()
+        sample_s += fetched - ready
+
         # batch_data is a subgraph + the batch of edges
-        # Move everything to device
-        batch_data = batch_data.to(device)
-        
-        # Forward pass on the subgraph
-        x_emb = model(batch_data.x, batch_data.edge_index)
-        
-        # The loader automatically renumbers nodes in the subgraph,
-        # so batch_data.edge_label_index references subgraph node indices.
-        user_emb = x_emb[batch_data.edge_label_index[0]]
-        movie_emb = x_emb[batch_data.edge_label_index[1]]
-        
-        pred = model.predict_prob(user_emb, movie_emb)
+        batch_data = batch_data.to(device, non_blocking=True)
+
+        pred = score(model, batch_data)
         true = batch_data.edge_label  # shape [batch_size]
-        
+
         loss = criterion(pred, true)
         loss.backward()
         optimizer.step()
@@ -101,24 +114,29 @@ def train_epoch(loader):
         total_loss += float(loss) * batch_size
         total_edges += batch_size
 
-    # Return average loss across *all* edges in the epoch
-    return total_loss / total_edges
+        ready = time.perf_counter()
+        compute_s += ready - fetched
+
+    # Average loss across *all* edges in the epoch
+    return total_loss / total_edges, {"sample_s": sample_s, "compute_s": compute_s}
+
 
 @torch.no_grad()
-def eval_epoch(loader):
+def eval_epoch(model, loader, criterion, device, score=score_batch):
     model.eval()
     total_loss = 0
     total_edges = 0
     correct = 0
+    sample_s = compute_s = 0.0
 
+    ready = time.perf_counter()
     for batch_data in loader:
-        batch_data = batch_data.to(device)
+        fetched = time.perf_counter()
+        sample_s += fetched - ready
 
-        x_emb = model(batch_data.x, batch_data.edge_index)
+        batch_data = batch_data.to(device, non_blocking=True)
 
-        user_emb = x_emb[batch_data.edge_label_index[0]]
-        movie_emb = x_emb[batch_data.edge_label_index[1]]
-        pred = model.predict_prob(user_emb, movie_emb)
+        pred = score(model, batch_data)
 
         true = batch_data.edge_label
         loss = criterion(pred, true)
@@ -130,17 +148,107 @@ def eval_epoch(loader):
         pred_class = (pred > 0.5).float()
         correct += (pred_class == true).sum().item()
 
+        ready = time.perf_counter()
+        compute_s += ready - fetched
+
     avg_loss = total_loss / total_edges
     accuracy = correct / total_edges
-    return avg_loss, accuracy
+    return avg_loss, accuracy, {"sample_s": sample_s, "compute_s": compute_s}
+
+
+def format_timings(timings):
+    total = timings["sample_s"] + timings["compute_s"]
+    share = timings["sample_s"] / total if total else 0.0
+    return f"sample {timings['sample_s']:.1f}s / compute {timings['compute_s']:.1f}s ({share:.0%} waiting)"
+
 
 ###############################################################################
 # 12) Run Training
 ###############################################################################
-num_epochs = 10
-for epoch in range(1, num_epochs + 1):
-    train_loss = train_epoch(train_loader)
-    val_loss, val_acc = eval_epoch(val_loader)
-    print(f"Epoch {epoch:02d} | "
-          f"Train Loss: {train_loss:.4f} | "
-          f"Val Loss: {val_loss:.4f} | Val Acc: {val_acc:.4f}")
+def build_parser():
+    parser = argparse.ArgumentParser(description="Train the GraphSAGE movie recommender")
+    parser.add_argument("--data-dir", default="./movie_lens_db")
+    parser.add_argument("--ratings-chunksize", type=int, default=None,
+                        help="stream ratings.csv in chunks of this many rows (large dumps)")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--lr", type=float, default=1e-2)
+    parser.add_argument("--num-neighbors", type=int, nargs="+", default=[10, 10])
+    parser.add_argument("--seed", type=int, default=None,
+                        help="split / init seed (default: a random one, saved with the model)")
+    parser.add_argument("--num-workers", type=int, default=min(4, (os.cpu_count() or 1) - 1),
+                        help="sampler processes per loader (0 = sample in the main process)")
+    parser.add_argument("--persistent-workers", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--prefetch-factor", type=int, default=2,
+                        help="batches queued ahead by each worker")
+    parser.add_argument("--pin-memory", action=argparse.BooleanOptionalAction, default=None,
+                        help="page-lock batches (default: only when training on CUDA)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="intra-op threads for the model (default: torch's choice)")
+    parser.add_argument("--embed-chunk-size", type=int, default=None,
+                        help="export embeddings with layer-wise chunked inference")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.seed is None:
+        args.seed = int(np.random.SeedSequence().entropy % 2**31)
+        print(f"Seed: {args.seed}")
+    torch.manual_seed(args.seed)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    data, user2node, movie2node, unique_movies, unique_users, feature_dim = load_data(
+        args.data_dir, chunksize=args.ratings_chunksize)
+    train_idx, val_idx = split_edges(data.edge_index.shape[1], seed=args.seed)
+
+    ###########################################################################
+    # 10) Initialize Model & Optimizer
+    ###########################################################################
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    pin_memory = device.type == "cuda" if args.pin_memory is None else args.pin_memory
+
+    loader_options = dict(
+        batch_size=args.batch_size,
+        num_neighbors=args.num_neighbors,
+        num_workers=max(0, args.num_workers),
+        persistent_workers=args.persistent_workers,
+        prefetch_factor=args.prefetch_factor,
+        pin_memory=pin_memory,
+    )
+    train_loader = make_loader(data, train_idx, shuffle=True, **loader_options)
+    val_loader = make_loader(data, val_idx, shuffle=False, **loader_options)
+
+    model = MovieRecommenderEngine(
+        in_channels=feature_dim,
+        hidden_channels=32,
+        out_channels=16
+    ).to(device)
+
+    criterion = nn.BCELoss()
+    optimizer = optim.Adam(model.parameters(), lr=args.lr)
+
+    for epoch in range(1, args.epochs + 1):
+        train_loss, train_t = train_epoch(model, train_loader, optimizer, criterion, device)
+        val_loss, val_acc, val_t = eval_epoch(model, val_loader, criterion, device)
+        print(f"Epoch {epoch:02d} | "
+              f"Train Loss: {train_loss:.4f} | "
+              f"Val Loss: {val_loss:.4f} | Val Acc: {val_acc:.4f}")
+        print(f"         | train {format_timings(train_t)} | val {format_timings(val_t)}")
+
+    ###########################################################################
+    # 13) Save Model & Export Embeddings for Serving
+    ###########################################################################
+    layer_times = []
+    x_emb = compute_all_embeddings(data, model, device, chunk_size=args.embed_chunk_size,
+                                   num_threads=args.threads, layer_times=layer_times)
+    if layer_times:
+        print(f"Layer-wise embeddings (chunks of {args.embed_chunk_size}): {format_layer_times(layer_times)}")
+    save_model(model, user2node, movie2node, unique_movies, feature_dim,
+               x_emb=x_emb, unique_users=unique_users, data_dir=args.data_dir,
+               split_seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
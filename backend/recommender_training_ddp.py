@@ -0,0 +1,171 @@
+import os
+import datetime
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel
+
+from movie_dataset import load_data
+from recommender_model import MovieRecommenderEngine, save_model
+from recommender_inference import compute_all_embeddings, format_layer_times
+from recommender_training import (
+    build_parser, split_edges, make_loader, train_epoch, eval_epoch, format_timings,
+)
+
+###############################################################################
+# Distributed Data-Parallel Training (gloo, CPU)
+###############################################################################
+# Every rank holds the full graph (neighbor sampling needs it) but trains on
+# its own shard of the training edges; DDP all-reduces the gradients after
+# each backward pass, so all ranks step identical weights. Validation runs on
+# shards too and the per-rank sums are all-reduced into global metrics.
+#
+# Local test with 4 processes on one machine:
+#     python recommender_training_ddp.py --nproc 4 --epochs 2
+# Several machines (one launcher per node, same --master-addr):
+#     torchrun --nnodes 2 --nproc-per-node 4 --node-rank 0 \
+#         --master-addr 10.0.0.1 --master-port 29500 recommender_training_ddp.py
+
+
+class LinkScorer(nn.Module):
+    """
+    The SAGE encoder and the edge_mlp head behind a single forward, so DDP
+    sees every parameter used in forward and synchronizes all their gradients
+    (predict_prob alone would bypass the DDP wrapper).
+    """
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x, edge_index, edge_label_index):
+        x_emb = self.model(x, edge_index)
+        user_emb = x_emb[edge_label_index[0]]
+        movie_emb = x_emb[edge_label_index[1]]
+        return self.model.predict_prob(user_emb, movie_emb)
+
+
+def score_ddp(scorer, batch_data):
+    return scorer(batch_data.x, batch_data.edge_index, batch_data.edge_label_index)
+
+
+def shard(edge_idx, rank, world_size, equal=True):
+    """
+    This rank's contiguous slice of (already shuffled) edge ids. With `equal`
+    the remainder is dropped so every rank runs the same number of batches;
+    otherwise DDP's collectives would wait on a rank that has finished.
+    """
+    if equal:
+        per_rank = len(edge_idx) // world_size
+        return edge_idx[rank * per_rank:(rank + 1) * per_rank]
+    return torch.tensor_split(edge_idx, world_size)[rank]
+
+
+def all_reduce_sum(values):
+    totals = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(totals, op=dist.ReduceOp.SUM)
+    return totals.tolist()
+
+
+def run(rank, world_size, args):
+    if "RANK" not in os.environ:
+        os.environ.setdefault("MASTER_ADDR", "127.0.0.1")
+        os.environ.setdefault("MASTER_PORT", str(args.master_port))
+    dist.init_process_group("gloo", rank=rank, world_size=world_size,
+                            timeout=datetime.timedelta(minutes=30))
+
+    # Split the cores between the ranks sharing this machine
+    local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", world_size))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // local_world_size)
+    torch.set_num_threads(threads)
+    seed = 0 if args.seed is None else args.seed
+    torch.manual_seed(seed)
+
+    # Rank 0 parses the CSVs and writes the graph snapshot; the others then
+    # map that snapshot instead of parsing the CSVs again themselves
+    if rank == 0:
+        load_data(args.data_dir, chunksize=args.ratings_chunksize)
+    dist.barrier()
+    data, user2node, movie2node, unique_movies, unique_users, feature_dim = load_data(
+        args.data_dir, chunksize=args.ratings_chunksize)
+
+    # Same seed, same split on every rank; each then takes its own shard
+    train_idx, val_idx = split_edges(data.edge_index.shape[1], seed=seed)
+    train_shard = shard(train_idx, rank, world_size)
+    val_shard = shard(val_idx, rank, world_size, equal=False)
+
+    device = torch.device("cpu")
+    loader_options = dict(
+        batch_size=args.batch_size,
+        num_neighbors=args.num_neighbors,
+        num_workers=max(0, args.num_workers),
+        persistent_workers=args.persistent_workers,
+        prefetch_factor=args.prefetch_factor,
+    )
+    train_loader = make_loader(data, train_shard, shuffle=True, **loader_options)
+    val_loader = make_loader(data, val_shard, shuffle=False, **loader_options)
+
+    model = MovieRecommenderEngine(
+        in_channels=feature_dim,
+        hidden_channels=32,
+        out_channels=16
+    )
+    # DDP broadcasts rank 0's initial weights to every rank
+    scorer = DistributedDataParallel(LinkScorer(model))
+
+    criterion = nn.BCELoss()
+    optimizer = optim.Adam(scorer.parameters(), lr=args.lr)
+
+    for epoch in range(1, args.epochs + 1):
+        train_loss, train_t = train_epoch(scorer, train_loader, optimizer, criterion, device,
+                                          score=score_ddp)
+        val_loss, val_acc, val_t = eval_epoch(scorer, val_loader, criterion, device,
+                                              score=score_ddp)
+
+        num_train, num_val = len(train_shard), len(val_shard)
+        loss_sum, train_edges, val_loss_sum, correct, val_edges = all_reduce_sum([
+            train_loss * num_train, num_train, val_loss * num_val, val_acc * num_val, num_val,
+        ])
+        if rank == 0:
+            print(f"Epoch {epoch:02d} | "
+                  f"Train Loss: {loss_sum / train_edges:.4f} | "
+                  f"Val Loss: {val_loss_sum / val_edges:.4f} | Val Acc: {correct / val_edges:.4f}")
+            print(f"         | rank 0 train {format_timings(train_t)} | val {format_timings(val_t)}")
+            # Weights-only checkpoint; embeddings are exported once at the end
+            save_model(model, user2node, movie2node, unique_movies, feature_dim, split_seed=seed)
+
+    if rank == 0:
+        layer_times = []
+        x_emb = compute_all_embeddings(data, model, device, chunk_size=args.embed_chunk_size,
+                                       num_threads=threads, layer_times=layer_times)
+        if layer_times:
+            print(f"Layer-wise embeddings (chunks of {args.embed_chunk_size}): "
+                  f"{format_layer_times(layer_times)}")
+        save_model(model, user2node, movie2node, unique_movies, feature_dim,
+                   x_emb=x_emb, unique_users=unique_users, data_dir=args.data_dir,
+                   split_seed=seed)
+    dist.barrier()
+    dist.destroy_process_group()
+
+
+def main(argv=None):
+    parser = build_parser()
+    parser.description = "Train the GraphSAGE movie recommender with DDP on gloo"
+    parser.add_argument("--nproc", type=int, default=2,
+                        help="processes to spawn on this machine (ignored under torchrun)")
+    parser.add_argument("--master-port", type=int, default=29500)
+    # Ranks already split the cores; sample in the trainer unless asked otherwise
+    parser.set_defaults(num_workers=0)
+    args = parser.parse_args(argv)
+
+    if "RANK" in os.environ:
+        # Launched by torchrun, which sets RANK / WORLD_SIZE / MASTER_ADDR
+        run(int(os.environ["RANK"]), int(os.environ["WORLD_SIZE"]), args)
+    else:
+        mp.spawn(run, args=(args.nproc, args), nprocs=args.nproc, join=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import time
+import asyncio
+from collections import deque
+
+import numpy as np
+
+###############################################################################
+# Micro-batching for Concurrent Recommendation Requests
+###############################################################################
+# Requests are queued. A single worker task takes the first waiting request,
+# keeps collecting for up to `max_wait_ms` (or until `max_batch_size`), and
+# scores the whole batch with one call into the engine in a worker thread.
+# Requests that arrive while a batch is being scored form the next batch, so
+# under load the batch size grows with concurrency instead of the number of
+# scoring passes. The extra latency per request is bounded by `max_wait_ms`,
+# the batch already being scored, and its own batch; see `stats()`. If
+# scoring a batch raises, its requests are re-scored one by one so only the
+# request that caused the error fails.
+
+
+class RecommendationBatcher:
+    def __init__(self, get_engine, max_batch_size=64, max_wait_ms=2.0, history=10000):
+        """
+        `get_engine()` is called once per batch, so an engine swapped in by
+        reload_engine() is picked up by the next batch. The last `history`
+        requests are kept for the latency percentiles in `stats()`.
+        """
+        self.get_engine = get_engine
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._worker = None
+        self._last_batch_size = 0
+
+        self.requests = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self._batch_sizes = deque(maxlen=history)
+        self._waits = deque(maxlen=history)
+        self._latencies = deque(maxlen=history)
+
+    def start(self):
+        """
+        Start the worker on the running event loop (done lazily on first use).
+        """
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def recommend(self, known_movie_ids, topK=5):
+        """
+        Top-K (movieId, prob) pairs for one anonymous user, scored together
+        with whatever other requests arrive in the same window.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((tuple(known_movie_ids), topK, time.perf_counter(), future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        # A lone request after a lone batch means there is no concurrency to
+        # coalesce, so take what is queued without waiting out the window
+        wait = self.max_wait if self._last_batch_size > 1 else 0.0
+        deadline = time.perf_counter() + wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            self._last_batch_size = len(batch)
+            # Drop requests whose caller has already gone away
+            batch = [item for item in batch if not item[3].done()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+
+            # One scoring pass per distinct top_k, so a single large k does not
+            # make the whole batch pay for it; identical requests share a row
+            groups = {}
+            for known, k, _, _ in batch:
+                rows = groups.setdefault(k, {})
+                rows.setdefault(known, len(rows))
+            engine = self.get_engine()
+            try:
+                results = await asyncio.to_thread(self._score_groups, engine, groups)
+            except Exception:
+                self.failed_batches += 1
+                await self._score_each(engine, batch)
+                continue
+
+            finished = time.perf_counter()
+            self.batches += 1
+            self.requests += len(batch)
+            self._batch_sizes.append(len(batch))
+            for known, k, enqueued, future in batch:
+                self._waits.append(started - enqueued)
+                self._latencies.append(finished - enqueued)
+                if not future.done():
+                    future.set_result(results[k][groups[k][known]])
+
+    async def _score_each(self, engine, batch):
+        """
+        Fallback for a failed batch: score every request on its own, so the
+        error only reaches the caller(s) whose request raised it.
+        """
+        for known, k, _, future in batch:
+            if future.done():
+                continue
+            try:
+                result = await asyncio.to_thread(self._score_groups, engine, {k: {known: 0}})
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result(result[k][0])
+
+    @staticmethod
+    def _score_groups(engine, groups):
+        return {k: engine.recommend_many(list(rows), k) for k, rows in groups.items()}
+
+    def stats(self):
+        def percentiles(seconds):
+            if not seconds:
+                return {"p50_ms": 0.0, "p99_ms": 0.0}
+            ms = np.asarray(seconds) * 1000.0
+            return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99))}
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "mean_batch_size": float(np.mean(self._batch_sizes)) if self._batch_sizes else 0.0,
+            "queue_wait": percentiles(list(self._waits)),
+            "latency": percentiles(list(self._latencies)),
+        }
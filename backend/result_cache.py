@@ -0,0 +1,96 @@
+import time
+import threading
+from collections import OrderedDict
+
+###############################################################################
+# Thread-safe LRU Cache with Optional TTL
+###############################################################################
+
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=None, maxweight=None, weigh=None):
+        """
+        Keep at most `maxsize` entries, evicting the least recently used.
+        Entries older than `ttl` seconds (if set) are treated as misses.
+
+        With `maxweight` and `weigh(value)`, entries are also evicted until
+        their total weight (e.g. bytes) fits; a single value heavier than
+        `maxweight` is never stored.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxweight = maxweight
+        self.weigh = weigh or (lambda value: 0)
+        self.weight = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Return the cached value for `key`, or MISSING.
+        """
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is not MISSING:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._pop(key)
+                self.expirations += 1
+            self.misses += 1
+            return MISSING
+
+    def _pop(self, key):
+        value, _ = self._data.pop(key)
+        self.weight -= self.weigh(value)
+
+    def set(self, key, value):
+        weight = self.weigh(value)
+        if self.maxsize <= 0 or (self.maxweight is not None and weight > self.maxweight):
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, time.monotonic())
+            self.weight += weight
+            while len(self._data) > self.maxsize or (
+                self.maxweight is not None and self.weight > self.maxweight
+            ):
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Drop every entry, e.g. when the data behind them changes.
+        """
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "weight": self.weight,
+                "maxweight": self.maxweight,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
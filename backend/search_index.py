@@ -0,0 +1,144 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+###############################################################################
+# In-process Trigram Title Search
+###############################################################################
+# Titles are normalized (accents stripped, lower-cased, punctuation dropped)
+# and split into pg_trgm-style trigrams. Fuzzy candidates come from the
+# inverted trigram lists; a title matches when it contains enough of the
+# query's trigrams (so typos still match). Every title containing the query
+# as a substring matches too, exactly like the ILIKE '%query%' it replaces,
+# which is what one- and two-letter queries typed so far rely on. Substring
+# candidates are the titles holding every unpadded trigram of the query's
+# words (a postings intersection), then checked with `in`; only queries with
+# no word of three or more letters scan every title. Ranking adds the
+# title-level Jaccard similarity and boosts substring and prefix hits.
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def trigrams(normalized):
+    """
+    Distinct trigrams of every word, padded like pg_trgm ("  w", " wo", ...).
+    """
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TitleSearchIndex:
+    def __init__(self, rows, min_similarity=0.4, min_fuzzy_length=4):
+        """
+        Build the index from (movie_id, title, year) rows.
+        Matches need at least `min_similarity` of the query's trigrams in the
+        title or the query as a substring; queries shorter than
+        `min_fuzzy_length` must match as a substring.
+        """
+        self.min_similarity = min_similarity
+        self.min_fuzzy_length = min_fuzzy_length
+
+        ids, titles, years, sizes = [], [], [], []
+        postings = defaultdict(list)
+        for doc, (movie_id, title, year) in enumerate(rows):
+            norm = normalize(title or "")
+            grams = trigrams(norm)
+            ids.append(movie_id)
+            titles.append(norm)
+            years.append(year)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(doc)
+
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.titles = titles
+        # Leading space so " query" finds word prefixes, the first word included
+        self.padded_titles = [f" {title}" for title in titles]
+        self.years = np.asarray(years, dtype=object)
+        self.sizes = np.asarray(sizes, dtype=np.int32)
+        self.postings = {
+            gram: np.asarray(docs, dtype=np.int32) for gram, docs in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, year=None):
+        """
+        Movie ids matching `query` (optionally only from `year`), best first.
+        """
+        norm = normalize(query)
+        if not norm:
+            return []
+        grams = trigrams(norm)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+
+        substring_docs = self._substring_docs(norm)
+
+        # Shared-trigram count per candidate title in one pass over postings
+        if lists:
+            trigram_docs, shared = np.unique(np.concatenate(lists), return_counts=True)
+        else:
+            trigram_docs, shared = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+        docs = np.union1d(trigram_docs, substring_docs)
+        shared_all = np.zeros(len(docs), dtype=np.int64)
+        shared_all[np.searchsorted(docs, trigram_docs)] = shared
+        coverage = shared_all / len(grams)
+        jaccard = shared_all / (len(grams) + self.sizes[docs] - shared_all)
+        is_substring = np.isin(docs, substring_docs, assume_unique=True)
+
+        if year:
+            keep = self.years[docs] == year
+            docs, coverage, jaccard, is_substring = (
+                docs[keep], coverage[keep], jaccard[keep], is_substring[keep])
+
+        if len(norm) >= self.min_fuzzy_length:
+            matched = (coverage >= self.min_similarity) | is_substring
+        else:
+            matched = is_substring
+        scores = coverage + jaccard + is_substring
+
+        prefix, padded = f" {norm}", self.padded_titles
+        hits = np.flatnonzero(is_substring)
+        scores[hits] += 0.5 * np.fromiter((prefix in padded[d] for d in docs[hits].tolist()),
+                                          dtype=bool, count=len(hits))
+
+        docs, scores = docs[matched], scores[matched]
+        # Best score first; ties broken by id for a stable order
+        order = np.lexsort((self.ids[docs], -scores))
+        return self.ids[docs[order]].tolist()
+
+    def _substring_docs(self, norm):
+        """
+        Sorted docs whose title contains `norm`. A title containing it holds
+        every inner (unpadded) trigram of its words, so the postings of those
+        narrow the candidates before the exact `in` check.
+        """
+        inner = {word[i:i + 3] for word in norm.split() for i in range(len(word) - 2)}
+        if inner:
+            if not all(g in self.postings for g in inner):
+                return np.empty(0, dtype=np.int32)
+            lists = sorted((self.postings[g] for g in inner), key=len)
+            candidates = lists[0]
+            for docs in lists[1:]:
+                if not len(candidates):
+                    break
+                candidates = np.intersect1d(candidates, docs, assume_unique=True)
+        else:
+            # One- and two-letter words only: no trigram to narrow by
+            candidates = np.arange(len(self.titles), dtype=np.int32)
+        titles = self.titles
+        keep = np.fromiter((norm in titles[d] for d in candidates.tolist()),
+                           dtype=bool, count=len(candidates))
+        return candidates[keep]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import torch
+
+from benchmarks.synthetic import write_synthetic_movielens
+from movie_dataset import load_data
+from recommender_model import MovieRecommenderEngine
+from recommender_inference import RecommenderEngine, compute_all_embeddings, device
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    data_dir = write_synthetic_movielens(str(tmp_path_factory.mktemp("data")), 20000)
+    graph = load_data(data_dir, use_cache=False)
+    torch.manual_seed(0)
+    model = MovieRecommenderEngine(graph[-1], 32, 16)
+    return RecommenderEngine.from_graph(model, *graph)
+
+
+def assert_matches_full_recompute(updated):
+    full_x_emb = compute_all_embeddings(updated.data, updated.model, device)
+    movie_nodes = torch.tensor([updated.movie2node[mid] for mid in updated.unique_movies])
+    assert torch.allclose(updated.full_x_emb, full_x_emb, atol=1e-5)
+    assert torch.allclose(updated.movie_emb.cpu(), full_x_emb[movie_nodes], atol=1e-5)
+
+
+def test_existing_users(engine):
+    rng = np.random.default_rng(0)
+    users = rng.choice(np.asarray(engine.unique_users), size=50)
+    movies = rng.choice(np.asarray(engine.unique_movies), size=50)
+    updated = engine.with_ratings(users, movies, rng.choice([1.0, 3.5, 5.0], size=50))
+
+    assert len(updated.unique_users) == len(engine.unique_users)
+    assert updated.data.edge_index.shape[1] == engine.data.edge_index.shape[1] + 50
+    assert_matches_full_recompute(updated)
+
+
+def test_new_users(engine):
+    new_user = int(np.max(engine.unique_users)) + 1
+    movies = np.asarray(engine.unique_movies)[:5]
+    updated = engine.with_ratings([new_user] * 5 + [new_user + 1], np.append(movies, movies[0]),
+                                  [5.0, 4.0, 2.0, 3.0, 1.0, 4.5])
+
+    assert list(updated.unique_users[-2:]) == [new_user, new_user + 1]
+    assert updated.user2node[new_user + 1] == engine.data.num_nodes + 1
+    assert new_user not in engine.user2node
+    assert_matches_full_recompute(updated)
+
+
+def test_unknown_movie_raises(engine):
+    num_edges = engine.data.edge_index.shape[1]
+    unknown = int(np.max(engine.unique_movies)) + 1
+    with pytest.raises(KeyError):
+        engine.with_ratings([int(engine.unique_users[0])], [unknown], [4.0])
+    assert engine.data.edge_index.shape[1] == num_edges